@@ -0,0 +1 @@
+"""Benchmarks do Dashboard QSSMA (python -m benchmarks.executar)."""
@@ -0,0 +1,235 @@
+"""
+================================================================================
+BENCHMARKS - DASHBOARD QSSMA (PRUMO ENGENHARIA)
+================================================================================
+Mede cada etapa do dashboard sobre planilhas sintéticas (benchmarks/sintetico.py)
+de 10 mil, 100 mil e 1 milhão de células (linhas após o unpivot):
+
+    python -m benchmarks.executar                              # todos os tamanhos
+    python -m benchmarks.executar --tamanhos 10000 --repeticoes 5
+    python -m benchmarks.executar --comparar abc1234 def5678    # compara dois commits
+    python -m benchmarks.executar --motores pandas arrow        # motores de consulta
+
+Cada medição vira uma linha JSON em benchmarks/resultados.jsonl (commit, tamanho,
+etapa, tempos), para comparar versões do código ao longo do tempo. As etapas de
+cada motor de consulta (qssma/consultas.py) levam o nome do motor como prefixo
+('arrow.selecao') e, ao fim de cada tamanho, sai a razão pandas / outro motor.
+================================================================================
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.sintetico import planilha_sintetica
+from qssma.etl import COLUNAS_ID, classificar_vetorizado, preparar_planilha, transformar_planilha, processar_em_blocos
+from qssma.kpis import calcular_kpis, montar_cubo, linhas_das_celulas
+from qssma.busca import IndiceBusca
+from qssma.filtros import COLUNAS_FILTRO, MotorFiltros
+from qssma.consultas import MOTORES, criar_consultas
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+PASTA_DADOS = os.path.join(PASTA, '.dados')
+ARQUIVO_RESULTADOS = os.path.join(PASTA, 'resultados.jsonl')
+TAMANHOS = [10_000, 100_000, 1_000_000]
+
+# Cores fixas só para montar as figuras (as da identidade visual ficam no app)
+CORES = {'Externo (Custo)': '#501E0A', 'Interno (SESMT)': '#Fa7828'}
+
+
+def versao_codigo():
+    """Commit atual (com '+alterado' se houver mudanças não commitadas) ou None fora do git."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PASTA,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        alterado = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=PASTA,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ('+alterado' if alterado else '')
+    except Exception:
+        return None
+
+
+def medir(funcao, repeticoes):
+    """Executa a função 'repeticoes' vezes; retorna (último resultado, lista de tempos em s)."""
+    tempos, resultado = [], None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return resultado, tempos
+
+
+def cascata(filtros, linhas_busca=None, parcial=False):
+    """
+    Reproduz a cascata da barra lateral: cada dimensão lista as opções restantes
+    e aplica a seleção. parcial=False é a visão inicial (tudo marcado, nenhum
+    treinamento); parcial=True marca metade das opções e 3 treinamentos.
+    """
+    mascara = filtros.mascara_inicial(linhas_busca)
+    for col in COLUNAS_FILTRO:
+        opcoes = filtros.opcoes(col, mascara)
+        if col == 'Treinamento':
+            selecionados = opcoes[:3] if parcial else []
+            if selecionados:
+                filtros.aplicar(mascara, col, selecionados)
+        else:
+            selecionados = opcoes[:max(1, len(opcoes) // 2)] if parcial else opcoes
+            filtros.aplicar(mascara, col, selecionados, opcoes)
+    return mascara
+
+
+def montar_graficos(kpis, cubo):
+    """As cinco figuras do dashboard, serializadas como o st.plotly_chart faz."""
+    from qssma.graficos import (
+        figura_top10_custos, figura_status, figura_ranking_custo, figura_ranking_saving, figura_eficiencia,
+    )
+    figuras = [
+        figura_top10_custos(kpis.externo, CORES['Externo (Custo)']),
+        figura_status(cubo, CORES),
+        figura_ranking_custo(kpis.externo, 'COORDENADOR', CORES['Externo (Custo)']),
+        figura_ranking_saving(kpis.interno, 'COORDENADOR', CORES['Interno (SESMT)']),
+        figura_eficiencia(cubo, 'COORDENADOR', CORES),
+    ]
+    return [fig.to_json() for fig in figuras if fig is not None]
+
+
+def agregados_graficos(consultas, cubo_filtrado, kpis, agrupar='COORDENADOR'):
+    """Os agrupamentos que alimentam as cinco figuras (seções 7.2 e 7.3 do app)."""
+    return [
+        consultas.agregar(kpis.externo, ['Treinamento'], 'Custo_Final'),
+        consultas.agregar(cubo_filtrado, ['Status'], 'Qtd'),
+        consultas.agregar(kpis.externo, [agrupar], 'Custo_Final'),
+        consultas.agregar(kpis.interno, [agrupar], 'Qtd'),
+        consultas.agregar(cubo_filtrado, [agrupar, 'Status'], 'Qtd'),
+    ]
+
+
+def razao_motores(medicoes):
+    """Tabela etapa x motor (tempo mínimo) com a razão pandas / motor, de cada etapa prefixada."""
+    tabela = pd.DataFrame([m for m in medicoes if '.' in m['etapa']])
+    if tabela.empty:
+        return
+    tabela[['motor', 'etapa']] = tabela['etapa'].str.split('.', n=1, expand=True)
+    tabela = tabela.pivot(index='etapa', columns='motor', values='min_s')
+    for motor in tabela.columns.drop('pandas', errors='ignore'):
+        if 'pandas' in tabela.columns:
+            tabela[f'pandas/{motor}'] = tabela['pandas'] / tabela[motor]
+    print(tabela.round(4).to_string(), flush=True)
+
+
+def executar_tamanho(linhas_longas, repeticoes, motores=('pandas',)):
+    """Mede todas as etapas para um tamanho; retorna a lista de medições."""
+    caminho = planilha_sintetica(linhas_longas, PASTA_DADOS)
+    medicoes = []
+
+    def registrar(etapa, funcao, linhas_entrada):
+        resultado, tempos = medir(funcao, repeticoes)
+        medicoes.append({
+            'etapa': etapa, 'linhas_entrada': int(linhas_entrada),
+            'min_s': round(min(tempos), 6), 'mediana_s': round(statistics.median(tempos), 6),
+            'tempos_s': [round(t, 6) for t in tempos],
+        })
+        print(f"  {etapa:<22} {min(tempos):9.4f}s  (mediana {statistics.median(tempos):.4f}s)", flush=True)
+        return resultado
+
+    # ETL
+    largo = registrar('leitura', lambda: preparar_planilha(pd.read_excel(caminho, header=0, engine='openpyxl')), 0)
+    celulas = largo.shape[0] * (largo.shape[1] - len(COLUNAS_ID))
+    registrar('melt_referencia', lambda: largo.melt(id_vars=COLUNAS_ID, var_name='Treinamento', value_name='Valor_Bruto'), celulas)
+    valores = pd.Series(largo.drop(columns=COLUNAS_ID).to_numpy(dtype=object).ravel(order='F'))
+    registrar('classificacao', lambda: classificar_vetorizado(valores), celulas)
+    df = registrar('transformar', lambda: transformar_planilha(largo), celulas)
+    registrar('leitura_em_blocos', lambda: processar_em_blocos(caminho), celulas)
+
+    # Estruturas derivadas
+    cubo, celula = registrar('cubo', lambda: montar_cubo(df), len(df))
+    indice = registrar('indice_busca', lambda: IndiceBusca(cubo), len(cubo))
+    filtros = registrar('motor_filtros', lambda: MotorFiltros(cubo), len(cubo))
+
+    # Interação (o que roda a cada clique)
+    registrar('busca', lambda: indice.buscar('NR 35'), len(cubo))
+    registrar('cascata_inicial', lambda: cascata(filtros), len(cubo))
+    mascara = registrar('cascata_parcial', lambda: cascata(filtros, parcial=True), len(cubo))
+    cubo_filtrado = cubo[mascara]
+    kpis = registrar('kpis', lambda: calcular_kpis(cubo), len(cubo))
+    registrar('kpis_filtrado', lambda: calcular_kpis(cubo_filtrado), len(cubo_filtrado))
+    registrar('graficos', lambda: montar_graficos(kpis, cubo), len(cubo))
+
+    # Motores de consulta: as mesmas etapas interativas em cada implementação
+    linhas_todas = linhas_das_celulas(cascata(filtros), celula)  # Auditoria sobre a visão inicial (maior seleção)
+    for motor in motores:
+        consultas = registrar(f'{motor}.montagem', lambda: criar_consultas(df, cubo, motor), len(cubo))
+        registrar(f'{motor}.cascata_parcial', lambda: cascata(consultas.filtros, parcial=True), len(cubo))
+        cubo_sel, kpis_sel = registrar(f'{motor}.selecao', lambda: consultas.selecao(mascara), len(cubo))
+        registrar(f'{motor}.agregados', lambda: agregados_graficos(consultas, cubo_sel, kpis_sel), len(cubo_filtrado))
+        registrar(f'{motor}.auditoria', lambda: consultas.maiores_custos_externos(linhas_todas, 50), len(linhas_todas))
+    razao_motores(medicoes)
+
+    for medicao in medicoes:
+        medicao['linhas_longas'] = int(len(df))
+    return medicoes
+
+
+def gravar(medicoes, tamanho, destino):
+    """Acrescenta as medições em JSON Lines, com o contexto da execução."""
+    contexto = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'commit': versao_codigo(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'maquina': platform.node(),
+        'tamanho': tamanho,
+    }
+    with open(destino, 'a', encoding='utf-8') as arquivo:
+        for medicao in medicoes:
+            arquivo.write(json.dumps({**contexto, **medicao}, ensure_ascii=False) + '\n')
+
+
+def comparar(destino, commit_a, commit_b):
+    """Tabela etapa x tamanho com o tempo mínimo de cada commit e a razão B/A."""
+    registros = pd.read_json(destino, lines=True)
+    registros['commit_base'] = registros['commit'].str.split('+').str[0]
+    tabela = (registros[registros['commit_base'].isin([commit_a, commit_b])]
+              .groupby(['tamanho', 'etapa', 'commit_base'])['min_s'].min()
+              .unstack('commit_base'))
+    faltando = [c for c in (commit_a, commit_b) if c not in tabela.columns]
+    if faltando:
+        print(f"Sem medições para: {', '.join(faltando)}", file=sys.stderr)
+        return 1
+    tabela['razao'] = tabela[commit_b] / tabela[commit_a]
+    print(tabela[[commit_a, commit_b, 'razao']].round(4).to_string())
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.executar', description='Benchmarks do Dashboard QSSMA.')
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS, help="células (linhas após o unpivot)")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--saida', default=ARQUIVO_RESULTADOS, help="arquivo JSON Lines (acrescenta)")
+    parser.add_argument('--comparar', nargs=2, metavar=('COMMIT_A', 'COMMIT_B'))
+    parser.add_argument('--motores', nargs='+', choices=list(MOTORES), default=list(MOTORES),
+                        help="motores de consulta medidos (qssma/consultas.py)")
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        return comparar(args.saida, *args.comparar)
+
+    for tamanho in args.tamanhos:
+        print(f"== {tamanho:,} células".replace(',', '.'), flush=True)
+        gravar(executar_tamanho(tamanho, args.repeticoes, args.motores), tamanho, args.saida)
+    print(f"Resultados acrescentados em {args.saida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Gerador de planilhas sintéticas com o mesmo formato da planilha oficial:
+CONTRATANTE / OBRAS / COORDENADOR / GERENCIA EXECUTIVA + uma coluna por
+treinamento (NR), com a mistura de conteúdos vista na prática ('INTERNO',
+'R$ 1.234,56', números, N/A, '-', vazio). Semente fixa: mesmo tamanho, mesmo arquivo.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+CONTRATANTES = ['VALE', 'RUMO', 'MRS', 'VLI', 'BAMIN ', 'GERDAU', 'BRK ', 'SCOF']
+GERENCIAS = ['GERÊNCIA EXEC. AA', 'GERÊNCIA EXEC. DB', 'GERÊNCIA EXEC. FA', 'GERÊNCIA EXEC. JC', 'GERÊNCIA EXEC. PV']
+COORDENADORES = ['COORDENAÇÃO DG', 'COORDENAÇÃO DO', 'COORDENAÇÃO LM', 'COORDENAÇÃO ML', 'COORDENAÇÃO PR']
+TREINAMENTOS = [
+    'NR 05 - CIPA', 'NR 06 - EPI', 'NR 10 - ELETRICIDADE', 'NR - 10 SEP', 'NR 11 - MUNCK',
+    'NR 11 - EMPILHADEIRA', 'NR 12 - MÁQUINAS', 'NR 12 - ROÇADEIRA', 'NR 17 - ERGONOMIA',
+    'NR 18 - CONSTRUÇÃO', 'NR 18 - SINALEIRO', 'NR 20 - INFLAMÁVEIS', 'NR 23 - BRIGADA (TEÓRICO)',
+    'NR 23 - BRIGADA (PRÁTICO)', 'NR 33 - ESPAÇO CONFINADO', 'NR 33 - VIGIA', 'NR 34 - OXICORTE',
+    'NR 35 - TRABALHO EM ALTURA', 'NR 35 - RESGATE', 'DIREÇÃO DEFENSIVA', 'PRIMEIROS SOCORROS',
+    'INTEGRAÇÃO', '7 REGRAS DA VIDA', 'ANÁLISE DE RISCO', 'PGR', 'FDS', 'ESCAVADEIRA',
+    'LINHA AMARELA', 'CÓDIGO DE CONDUTA', 'RO - MÓDULO 1', 'RO - MÓDULO 2', 'SIGO NÍVEL I',
+    'SIGO NÍVEL II', 'VIA PERMANENTE', 'MANUTENÇÃO FERROVIÁRIA', 'OPERAÇÃO DE GUINDASTE',
+    'MOTOSERRA', 'SOLDA', 'ANDAIMES', 'TOTAL GERAL',  # coluna de total: removida pelo ETL
+]
+
+# Proporção de cada tipo de conteúdo nas células da matriz (soma 1)
+MISTURA = {
+    'vazio': 0.30, 'na': 0.15, 'traco': 0.07,
+    'interno': 0.12, 'numero': 0.20, 'texto_brl': 0.16,
+}
+
+
+def _valores_celulas(rng, quantidade):
+    """Sorteia o conteúdo das células segundo a MISTURA (objetos Python, como o Excel devolve)."""
+    tipos = rng.choice(list(MISTURA), size=quantidade, p=list(MISTURA.values()))
+    precos = rng.choice(np.arange(50, 2500, 10), size=quantidade).astype(float)
+    centavos = rng.choice([0, 0, 0, 50, 90], size=quantidade) / 100
+
+    valores = np.empty(quantidade, dtype=object)
+    valores[tipos == 'vazio'] = None
+    valores[tipos == 'na'] = rng.choice(['N/A', 'NA', 'SEM REALIZAÇÃO'], size=(tipos == 'na').sum())
+    valores[tipos == 'traco'] = '-'
+    valores[tipos == 'interno'] = rng.choice(['INTERNO', 'Interno', 'PRUMO', 'Interno Prumo'], size=(tipos == 'interno').sum())
+
+    numero = tipos == 'numero'
+    valores[numero] = (precos[numero] + centavos[numero]).tolist()
+
+    texto = tipos == 'texto_brl'
+    valores[texto] = [
+        f"R$ {v:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+        for v in precos[texto] + centavos[texto]
+    ]
+    return valores
+
+
+def gerar_planilha(linhas_longas, semente=42):
+    """
+    Matriz larga com ~linhas_longas células de treinamento (= linhas após o
+    unpivot, antes de descartar vazios/N/A). Retorna um DataFrame.
+    """
+    rng = np.random.default_rng(semente)
+    colunas_nr = [c for c in TREINAMENTOS if 'TOTAL' not in c]
+    obras = max(1, -(-linhas_longas // len(colunas_nr)))
+
+    contratante = rng.choice(CONTRATANTES, size=obras)
+    df = pd.DataFrame({
+        'CONTRATANTE': contratante,
+        'OBRAS': [f"{c.strip()} OBRA {i:06d}" for i, c in enumerate(contratante)],
+        'COORDENADOR': rng.choice(COORDENADORES, size=obras),
+        'GERENCIA EXECUTIVA': rng.choice(GERENCIAS, size=obras),
+    })
+    valores = _valores_celulas(rng, obras * len(TREINAMENTOS)).reshape(obras, len(TREINAMENTOS))
+    return pd.concat([df, pd.DataFrame(valores, columns=TREINAMENTOS)], axis=1)
+
+
+def gravar_xlsx(df, caminho):
+    """Grava em .xlsx em modo write-only (rápido e com pouca memória)."""
+    livro = Workbook(write_only=True)
+    folha = livro.create_sheet()
+    folha.append(list(df.columns))
+    for linha in df.itertuples(index=False, name=None):
+        folha.append(list(linha))
+    livro.save(caminho)
+
+
+def planilha_sintetica(linhas_longas, pasta, semente=42):
+    """Caminho do .xlsx sintético do tamanho pedido, gerando-o apenas na primeira vez."""
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, f"sintetico_{linhas_longas}_{semente}.xlsx")
+    if not os.path.exists(caminho):
+        temporario = caminho + '.tmp.xlsx'
+        gravar_xlsx(gerar_planilha(linhas_longas, semente), temporario)
+        os.replace(temporario, caminho)
+    return caminho
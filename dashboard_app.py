@@ -12,20 +12,50 @@ de economia (Saving) geradas pelo SESMT interno e controlando o budget externo.
 
 ESTRUTURA DO CÓDIGO:
 1.  CONFIGURAÇÕES GERAIS: Setup da página e importação de bibliotecas.
-2.  IDENTIDADE VISUAL (CSS): Definição de cores, fontes e estilos dos componentes.
+2.  IDENTIDADE VISUAL (CSS): Cores; tema e fonte em .streamlit/, estilos em static/prumo.css.
 3.  FUNÇÕES AUXILIARES: Ferramentas de formatação (R$, datas, etc).
 4.  ETL (DATA ENGINE): Carregamento, limpeza e transformação dos dados brutos.
 5.  MOTOR DE FILTROS: Lógica de sidebar e filtros em cascata.
 6.  CÁLCULO DE KPIS: Matemática financeira do dashboard.
-7.  INTERFACE (UI): Construção visual dos gráficos, tabelas e métricas.
+7.  INTERFACE (UI): Construção visual dos gráficos, tabelas, métricas e evolução histórica.
+8.  DIAGNÓSTICO: Tempos por seção, caches e memória (opcional, ver 1.2).
+
+O ETL, a classificação, os KPIs, a busca e os filtros ficam no pacote qssma/
+(sem Streamlit). Para pré-processar as planilhas fora do app: python -m qssma
 ================================================================================
 """
 
 # --- 1. IMPORTAÇÃO DE BIBLIOTECAS ---
 import streamlit as st          # Framework principal da interface web
 import pandas as pd             # Manipulação de dados (ETL)
-import plotly.express as px     # Criação de gráficos interativos
-import plotly.graph_objects as go # Personalização avançada de gráficos
+import numpy as np              # Operações vetorizadas (classificação em lote)
+import os                       # Caminhos e metadados de arquivos
+import re                       # Compactação da folha de estilos
+import threading                # Atualização da planilha em segundo plano
+import logging                  # Registro de falhas fora da interface
+from dataclasses import dataclass
+from datetime import datetime
+from watchdog.observers import Observer              # Observa alterações na planilha
+from watchdog.events import FileSystemEventHandler
+# (O Plotly - via qssma.graficos - é importado só na seção 7, depois que métricas e filtros já foram para a tela)
+
+# Motor do dashboard sem Streamlit (pacote qssma, também usado por linha de comando:
+# python -m qssma). Aqui ficam apenas a interface e o monitor da planilha.
+from qssma.etl import (
+    ARQUIVO_EXCEL, ARQUIVO_CSV, COLUNAS_ID, COLUNA_ORIGEM, EXTENSOES_PLANILHA, ErroETL,
+    carregar_lista_longa, ler_planilha, preparar_planilha, transformar_planilha, gravar_cache_etl,
+    assinar_linhas, atualizar_incremental, listar_planilhas, ingerir_planilhas, pasta_das_planilhas,
+    planilha_temporaria, fonte_principal, impressao_digital, usar_leitura_em_blocos, processar_em_blocos,
+    ler_ultima_versao, data_das_planilhas,
+)
+from qssma.kpis import montar_cubo, linhas_das_celulas
+from qssma.busca import IndiceBusca, normalizar_texto
+from qssma.filtros import MemoSelecoes, chave_selecao
+from qssma.consultas import criar_consultas, MOTOR_CONSULTAS
+from qssma.historico import registrar_snapshot, versao_historico, datas_snapshot, tendencia
+from qssma.exportacao import FORMATOS, blocos_da_selecao, exportar
+from qssma.formatacao import formatar_brl, formatar_brl_vetorizado
+from qssma.diagnostico import Cronometro, medir, configurar_log, contadores_cache, ultimas_etapas, memoria_mb
 
 # --- 1.1 CONFIGURAÇÃO DA PÁGINA ---
 # Define título da aba, layout wide (tela cheia) e estado da barra lateral
@@ -35,11 +65,29 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+logger = logging.getLogger(__name__)
+
+# Copy-on-Write: a lista longa publicada é compartilhada por todas as sessões;
+# com CoW, colunas, fatias e derivados nunca alteram o original (e o to_numpy()
+# deles devolve arrays somente leitura). Ver seção 4.6.
+pd.set_option('mode.copy_on_write', True)
+
+# --- 1.2 DIAGNÓSTICO DE DESEMPENHO (OPCIONAL) ---
+# Cada seção marca o próprio tempo no cronômetro do rerun (ver qssma/diagnostico.py).
+# QSSMA_DIAGNOSTICO=1 liga o painel para todos e os logs JSON no terminal;
+# ?diagnostico=1 na URL liga só o painel da sessão.
+cronometro = Cronometro()
+DIAGNOSTICO_GLOBAL = os.environ.get('QSSMA_DIAGNOSTICO') == '1'
+if DIAGNOSTICO_GLOBAL:
+    configurar_log()
+mostrar_diagnostico = DIAGNOSTICO_GLOBAL or st.query_params.get('diagnostico') == '1'
+
 
 # ==============================================================================
 # 2. IDENTIDADE VISUAL E ESTILOS (CSS)
 # ==============================================================================
-# Centralizamos as cores aqui. Se a marca mudar, altere apenas estas variáveis.
+# Centralizamos as cores aqui. Se a marca mudar, altere estas variáveis (e o tema
+# em .streamlit/config.toml, que pinta a página antes do primeiro rerun).
 
 COR_PRUMO_BROWN = "#501E0A"   # Marrom Institucional (Usado em Títulos e Sidebar)
 COR_PRUMO_ORANGE = "#Fa7828"  # Laranja Destaque (Usado em Bordas e Gráficos de Interno)
@@ -47,211 +95,604 @@ COR_SAVING_GREEN = "#2A9D8F"  # Verde (Exclusivo para indicar Economia/Saving po
 COR_BG_BODY = "#F8F9FA"       # Off-White (Fundo suave para descanso visual)
 COR_TEXT_MUTED = "#666666"    # Cinza (Para rótulos e textos secundários)
 
+# Fonte (Montserrat local, sem Google Fonts) e cores base ficam no tema do
+# Streamlit (.streamlit/config.toml). Os ajustes dos componentes ficam em
+# static/prumo.css, lido e compactado uma única vez por processo.
+ARQUIVO_ESTILOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'prumo.css')
+
+
+@st.cache_resource
+def folha_de_estilos():
+    """<style> com as variáveis de cor (constantes acima) + static/prumo.css sem comentários/espaços."""
+    with open(ARQUIVO_ESTILOS, encoding='utf-8') as arquivo:
+        css = arquivo.read()
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css).strip()
+    variaveis = (
+        f"--cor-marrom:{COR_PRUMO_BROWN};--cor-laranja:{COR_PRUMO_ORANGE};--cor-saving:{COR_SAVING_GREEN};"
+        f"--cor-fundo:{COR_BG_BODY};--cor-texto-suave:{COR_TEXT_MUTED};"
+    )
+    return f"<style>:root{{{variaveis}}}{css}</style>"
+
+
 # Injeção de CSS customizado para sobrescrever o padrão do Streamlit
-st.markdown(f"""
-    <style>
-        /* Importa a fonte oficial 'Montserrat' do Google Fonts */
-        @import url('https://fonts.googleapis.com/css2?family=Montserrat:wght@400;500;600;700;800&display=swap');
-        
-        /* Aplica a fonte em todo o documento */
-        html, body, [class*="css"] {{
-            font-family: 'Montserrat', sans-serif;
-        }}
-        
-        /* Cor de fundo da área principal */
-        .main {{ background-color: {COR_BG_BODY}; }}
-        
-        /* --- ESTILO DA BARRA LATERAL (SIDEBAR) --- */
-        [data-testid="stSidebar"] {{ 
-            background-color: {COR_PRUMO_BROWN}; /* Fundo Marrom */
-        }}
-        /* Força todos os textos da sidebar a serem brancos */
-        [data-testid="stSidebar"] * {{ color: #ffffff !important; }}
-        
-        /* Corrige a cor do texto dentro das caixas de input (para não ficar branco no branco) */
-        [data-testid="stSidebar"] input {{ color: {COR_PRUMO_BROWN} !important; }}
-        div[data-baseweb="select"] span {{ color: {COR_PRUMO_BROWN} !important; }}
-        
-        /* --- ESTILO DOS TÍTULOS --- */
-        h1, h2, h3 {{ 
-            color: {COR_PRUMO_BROWN}; 
-            font-weight: 700; 
-        }}
-        
-        /* --- ESTILO DOS CARTÕES DE MÉTRICA (KPIs) --- */
-        div[data-testid="stMetric"] {{
-            background-color: #ffffff;
-            padding: 20px;
-            border-radius: 8px;
-            border-left: 6px solid {COR_PRUMO_ORANGE}; /* Borda Laranja à esquerda */
-            box-shadow: 0 4px 20px rgba(0,0,0,0.05);   /* Sombra suave */
-            min-height: 120px;
-        }}
-        
-        /* Rótulo (Ex: "Investimento Total") */
-        div[data-testid="stMetricLabel"] {{
-            font-size: 0.85rem !important;
-            color: {COR_TEXT_MUTED} !important;
-            font-weight: 600;
-            text-transform: uppercase;
-        }}
-        
-        /* Valor (Ex: "R$ 50.000") */
-        div[data-testid="stMetricValue"] {{
-            font-size: 1.6rem !important;
-            color: {COR_PRUMO_BROWN} !important;
-            font-weight: 800;
-        }}
-        
-        /* Delta/Detalhe (Texto pequeno abaixo do valor) */
-        div[data-testid="stMetricDelta"] {{
-            font-size: 0.8rem !important;
-            color: {COR_PRUMO_ORANGE} !important;
-            font-weight: 500;
-        }}
-        /* Remove a seta padrão do delta */
-        div[data-testid="stMetricDelta"] svg {{ display: none; }}
-
-        /* --- HACK CSS: Cor Específica para o KPI de Saving --- */
-        /* Seleciona o 3º Cartão (Saving) e força o texto de detalhe a ser VERDE */
-        div[data-testid="column"]:nth-of-type(3) div[data-testid="stMetricDelta"] {{
-            color: {COR_SAVING_GREEN} !important;
-            -webkit-text-fill-color: {COR_SAVING_GREEN} !important;
-        }}
-
-        /* Estilo das Tabelas de Dados */
-        .stDataFrame {{ border: 1px solid #eeeeee; border-radius: 8px; }}
-        
-    </style>
-""", unsafe_allow_html=True)
+st.markdown(folha_de_estilos(), unsafe_allow_html=True)
+cronometro.marcar('2 css')
 
 
 # ==============================================================================
 # 3. FUNÇÕES AUXILIARES
 # ==============================================================================
 
-def formatar_brl(valor):
+# ------------------------------------------------------------------------------
+# 3.1 MOTOR DE KPIS
+# ------------------------------------------------------------------------------
+# Indicadores, partições por Status e cubo de agregação ficam em qssma/kpis.py;
+# formatar_brl / formatar_brl_vetorizado em qssma/formatacao.py e as figuras
+# Plotly (com o rótulo de moeda R$) em qssma/graficos.py.
+
+
+# ------------------------------------------------------------------------------
+# 3.2 TABELA PAGINADA (FILTRO, ORDENAÇÃO E PÁGINA NO SERVIDOR)
+# ------------------------------------------------------------------------------
+# O navegador recebe só a página visível: filtro e ordenação trabalham com
+# posições (códigos das categorias / valores numéricos) e apenas as linhas da
+# página são copiadas e formatadas.
+COLUNAS_DETALHE = ['OBRAS', 'COORDENADOR', 'GERENCIA EXECUTIVA', 'Treinamento', 'Status', 'Custo_Final']
+TAMANHOS_PAGINA = [50, 100, 250, 500]
+
+
+def filtrar_posicoes(df, linhas, termo, colunas=COLUNAS_DETALHE):
+    """
+    Das posições 'linhas' (seleção atual), as que têm alguma coluna de texto
+    contendo o termo (sem acento, sem diferenciar maiúsculas). Nas categóricas o
+    teste roda só sobre as categorias distintas; o resultado volta às linhas pelos códigos.
     """
-    Formata valores float para moeda brasileira (R$ 1.234,56).
-    Trata erros caso venha valor nulo ou zero.
+    if not termo or not termo.strip():
+        return linhas
+
+    alvo = normalizar_texto(termo.strip())
+    mascara = np.zeros(len(linhas), dtype=bool)
+    for col in colunas:
+        serie = df[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            casa = np.array([alvo in normalizar_texto(c) for c in serie.cat.categories] + [False])
+            mascara |= casa[serie.cat.codes.to_numpy()[linhas]]  # código -1 (vazio) cai no último False
+        elif serie.dtype == object:
+            mascara |= serie.iloc[linhas].map(lambda v: alvo in normalizar_texto(v), na_action='ignore').fillna(False).to_numpy(dtype=bool)
+    return linhas[mascara]
+
+
+def ordenar_posicoes(df, posicoes, coluna=None, crescente=True):
     """
-    if pd.isna(valor) or valor == 0:
-        return "R$ 0,00"
-    # Lógica: Formata com vírgula padrão US (1,234.56) e depois inverte os caracteres
-    return f"R$ {valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    Reordena as posições pela coluna pedida (ordenação estável; vazios no fim).
+    Categóricas ordenam pelos códigos, que seguem a ordem alfabética das categorias.
+    """
+    if coluna is None or len(posicoes) == 0:
+        return posicoes
+
+    serie = df[coluna]
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        chave = serie.cat.codes.to_numpy()[posicoes].astype(np.float64)
+        chave[chave < 0] = np.nan
+    else:
+        chave = pd.to_numeric(serie, errors='coerce').to_numpy(dtype=np.float64)[posicoes]
+
+    if not crescente:
+        chave = -chave  # NaN continua NaN e segue no fim
+    return posicoes[np.argsort(chave, kind='stable')]
+
+
+def colunas_da_tabela(df):
+    """Colunas do Detalhamento (tabela e exportação): + planilha de origem quando houver várias."""
+    return COLUNAS_DETALHE + ([COLUNA_ORIGEM] if COLUNA_ORIGEM in df.columns else [])
+
+
+def pagina_da_tabela(df, posicoes, pagina, tamanho):
+    """Recorta a página (1-based) e formata o custo somente nas linhas exibidas."""
+    inicio = (pagina - 1) * tamanho
+    trecho = df.iloc[posicoes[inicio:inicio + tamanho]][colunas_da_tabela(df)].copy()
+    trecho['Custo Visual'] = formatar_brl_vetorizado(trecho['Custo_Final'])
+    return trecho
+
+
+def maiores_custos_externos(consultas, linhas, quantidade=50):
+    """
+    Auditoria: as 'quantidade' linhas externas de maior custo entre as posições
+    da seleção (ordenadas pelo motor de consultas), com o valor formatado.
+    """
+    topo = consultas.maiores_custos_externos(linhas, quantidade)
+    topo['Valor'] = formatar_brl_vetorizado(topo['Custo_Final'])
+    return topo
+
+
+# Exportação: o arquivo só é gerado quando o botão é clicado, numa thread à
+# parte (a sessão não trava), e escrito em blocos (qssma/exportacao.py).
+COLUNAS_AUDITORIA = ['Treinamento', 'OBRAS', 'COORDENADOR', 'Custo_Final']
+
+
+def botoes_exportacao(nome, gerar_blocos, colunas, chave):
+    """Um botão de download por formato (CSV, XLSX); gerar_blocos() devolve os blocos de linhas."""
+    for coluna, (formato, (extensao, mime)) in zip(st.columns(len(FORMATOS)), FORMATOS.items()):
+        coluna.download_button(
+            f"⬇️ {formato}", data=lambda formato=formato: exportar(gerar_blocos(), colunas, formato),
+            file_name=f"{nome}.{extensao}", mime=mime, on_click="ignore",
+            key=f"{chave}_{extensao}", use_container_width=True,
+        )
+
+
+# ------------------------------------------------------------------------------
+# 3.3 PAINEL DE DIAGNÓSTICO
+# ------------------------------------------------------------------------------
+HISTORICO_RERUNS = 20  # Reruns guardados por sessão no painel
+
+
+def linhas_marcadas(cubo, mascara):
+    """Linhas da lista longa representadas pelas células marcadas do cubo."""
+    return int(cubo['Qtd'].to_numpy()[mascara].sum())
+
+
+def painel_diagnostico(registro, etapas_filtro, tabelas):
+    """
+    Mostra os tempos do rerun atual (e dos anteriores da sessão), os acertos e
+    faltas dos caches, as linhas restantes após cada filtro e a memória das tabelas.
+    """
+    historico = st.session_state.setdefault('diagnostico_historico', [])
+    historico.append(registro)
+    del historico[:-HISTORICO_RERUNS]
+
+    with st.expander("⏱️ Diagnóstico de desempenho", expanded=True):
+        c_tempos, c_filtros = st.columns(2)
+        with c_tempos:
+            st.markdown(f"**Rerun atual: {registro['total_s'] * 1000:.0f} ms**")
+            st.dataframe(
+                pd.DataFrame({'Etapa': list(registro['etapas']), 'ms': [v * 1000 for v in registro['etapas'].values()]}),
+                hide_index=True, use_container_width=True,
+            )
+            etl = ultimas_etapas()
+            if etl:
+                st.markdown("**Última carga/atualização dos dados**")
+                st.dataframe(
+                    pd.DataFrame({'Etapa': list(etl), 'ms': [v * 1000 for v in etl.values()]}),
+                    hide_index=True, use_container_width=True,
+                )
+        with c_filtros:
+            st.markdown("**Linhas após cada filtro**")
+            st.dataframe(pd.DataFrame(etapas_filtro, columns=['Filtro', 'Linhas']), hide_index=True, use_container_width=True)
+            st.markdown("**Caches (acertos / faltas)**")
+            caches = contadores_cache()
+            st.dataframe(
+                pd.DataFrame([{'Cache': nome, **valores} for nome, valores in caches.items()], columns=['Cache', 'acertos', 'faltas']),
+                hide_index=True, use_container_width=True,
+            )
+            st.markdown("**Memória das tabelas**")
+            st.dataframe(
+                pd.DataFrame([(nome, len(t), memoria_mb(t)) for nome, t in tabelas.items()], columns=['Tabela', 'Linhas', 'MB']),
+                hide_index=True, use_container_width=True,
+            )
+
+        st.markdown(f"**Últimos {len(historico)} reruns desta sessão (ms)**")
+        st.dataframe(
+            pd.DataFrame([{'total': r['total_s'], **r['etapas']} for r in historico]).mul(1000).round(1),
+            use_container_width=True,
+        )
+
+
+# ------------------------------------------------------------------------------
+# 3.4 CACHE DE FIGURAS
+# ------------------------------------------------------------------------------
+@st.cache_resource
+def obter_cache_figuras():
+    """Cache LRU de figuras único por processo, compartilhado por todas as sessões."""
+    from qssma.graficos import CacheFiguras  # Plotly só no caminho da interface (ver 7.2)
+    return CacheFiguras()
+
+
+# ------------------------------------------------------------------------------
+# 3.5 MEMO DE SELEÇÕES
+# ------------------------------------------------------------------------------
+@st.cache_resource
+def obter_memo_selecoes():
+    """Memo de resultados por seleção, único por processo (ver qssma/filtros.py)."""
+    return MemoSelecoes()
+
+
+def calcular_selecao(base, mascara):
+    """
+    Células do cubo, posições das linhas brutas e KPIs de uma seleção (o que o
+    memo guarda). As linhas ficam na lista longa compartilhada: a seleção só
+    guarda as posições (somente leitura), nunca uma cópia das linhas.
+    """
+    cubo_filtrado, kpis = base.consultas.selecao(mascara)
+    linhas = linhas_das_celulas(mascara, base.celula)
+    linhas.setflags(write=False)
+    return cubo_filtrado, linhas, kpis
+
+
+# ------------------------------------------------------------------------------
+# 3.6 SEÇÕES COM RERUN PRÓPRIO (FRAGMENTOS)
+# ------------------------------------------------------------------------------
+# Os widgets de dentro destas seções reexecutam só a própria seção, com os
+# argumentos da última execução completa (dados já filtrados): o CSS, a cascata
+# da barra lateral, os KPIs e os gráficos do topo não são refeitos.
+# Cada execução da seção vai para o log de desempenho como um rerun parcial.
+
+@st.fragment
+def secao_rankings(consultas, cubo_filtrado, cubo_ext, cubo_int, selecao):
+    """7.3 Rankings comparativos, agrupados pelo seletor 'Comparar por'."""
+    from qssma.graficos import figura_ranking_custo, figura_ranking_saving, figura_eficiencia
+    relogio = Cronometro()
+    figuras = obter_cache_figuras()
+
+    st.markdown("### 📈 Rankings Comparativos")
+    
+    # Seletor de Agrupamento Dinâmico
+    col_sel, _ = st.columns([1, 4])
+    with col_sel:
+        agrupar = st.selectbox("Comparar por:", ["COORDENADOR", "OBRAS", "GERENCIA EXECUTIVA"], index=0)
+
+    g_new1, g_new2, g_new3 = st.columns(3)
+
+    # RANKING 1: QUEM GASTA MAIS (EXTERNO)
+    with g_new1:
+        st.markdown("**💸 Quem mais investe? (Externo)**")
+        fig_r1 = figuras.obter(('ranking_custo', selecao, agrupar), lambda: figura_ranking_custo(consultas.agregar(cubo_ext, [agrupar], 'Custo_Final'), agrupar, COR_PRUMO_BROWN))  # Marrom
+        if fig_r1 is not None:
+            st.plotly_chart(fig_r1, use_container_width=True)
+        else:
+            st.info("Sem dados de custo.")
+
+    # RANKING 2: QUEM GERA MAIS ECONOMIA (INTERNO)
+    with g_new2:
+        st.markdown("**🛡️ Quem mais gera Saving? (Interno)**")
+        # Laranja (Identidade visual para Interno)
+        fig_r2 = figuras.obter(('ranking_saving', selecao, agrupar), lambda: figura_ranking_saving(consultas.agregar(cubo_int, [agrupar], 'Qtd'), agrupar, COR_PRUMO_ORANGE))
+        if fig_r2 is not None:
+            st.plotly_chart(fig_r2, use_container_width=True)
+        else:
+            st.info("Sem dados de saving.")
+
+    # RANKING 3: EFICIÊNCIA (VOLUME)
+    with g_new3:
+        st.markdown("**📊 Eficiência (Interno vs Externo)**")
+        # Cores consistentes
+        cores_prop = {'Externo (Custo)': COR_PRUMO_BROWN, 'Interno (SESMT)': COR_PRUMO_ORANGE}
+        fig_r3 = figuras.obter(('eficiencia', selecao, agrupar), lambda: figura_eficiencia(consultas.agregar(cubo_filtrado, [agrupar, 'Status'], 'Qtd'), agrupar, cores_prop))
+        st.plotly_chart(fig_r3, use_container_width=True)
+    relogio.registrar(fragmento='7.3 rankings', agrupar=agrupar)
+
+
+@st.fragment
+def secao_detalhamento(df, linhas):
+    """7.4 Aba Detalhamento: tabela paginada (posições da seleção sobre a lista longa)."""
+    relogio = Cronometro()
+    # Tabela limpa para consulta (paginada: só a página atual vai para o navegador)
+    c_filtro, c_ordem, c_sentido, c_tamanho = st.columns([3, 2, 1, 1])
+    filtro_tabela = c_filtro.text_input("Filtrar tabela", placeholder="Ex: NR-35, Macaé...", key="det_filtro")
+    ordem = c_ordem.selectbox("Ordenar por", ["(ordem original)"] + COLUNAS_DETALHE, key="det_ordem")
+    sentido = c_sentido.selectbox("Sentido", ["Crescente", "Decrescente"], key="det_sentido")
+    tamanho = c_tamanho.selectbox("Linhas/página", TAMANHOS_PAGINA, key="det_tamanho")
+
+    posicoes = filtrar_posicoes(df, linhas, filtro_tabela)
+    posicoes = ordenar_posicoes(df, posicoes, None if ordem == "(ordem original)" else ordem, sentido == "Crescente")
+    total_linhas = len(posicoes)
+    total_paginas = max(1, -(-total_linhas // tamanho))
+
+    c_pagina, c_total = st.columns([1, 3])
+    pagina = c_pagina.number_input("Página", min_value=1, step=1, key="det_pagina")
+    pagina = min(int(pagina), total_paginas)  # Filtro novo pode encolher o total de páginas
+    c_total.caption(f"{total_linhas:,} registros".replace(",", ".") + f" · página {pagina} de {total_paginas}")
+
+    st.dataframe(pagina_da_tabela(df, posicoes, pagina, tamanho), use_container_width=True, hide_index=True)
+
+    # Exporta todas as páginas (com o filtro e a ordem da tabela), não só a visível
+    c_exportar, _ = st.columns([2, 5])
+    with c_exportar:
+        colunas = colunas_da_tabela(df)
+        botoes_exportacao("detalhamento_qssma", lambda: blocos_da_selecao(df, posicoes, colunas), colunas, "det_exportar")
+    relogio.registrar(fragmento='7.4 detalhamento', linhas=total_linhas)
 
 
 # ==============================================================================
 # 4. ETL - EXTRAÇÃO E TRATAMENTO DE DADOS
 # ==============================================================================
 
-@st.cache_data
-def carregar_dados_final():
+# Classificação, cache Parquet, leitura e unpivot ficam no pacote qssma
+# (qssma/etl.py), que não depende do Streamlit e pode rodar em outros processos.
+# A leitura roda em segundo plano no monitor (seção 4.7); o ponto de entrada da
+# página é obter_monitor().dados(), no fim desta seção.
+
+
+# ------------------------------------------------------------------------------
+# 4.6 ESTRUTURAS DERIVADAS (CUBO, BUSCA E FILTROS)
+# ------------------------------------------------------------------------------
+# Cubo de agregação (qssma/kpis.py), índice da Busca Global (qssma/busca.py) e
+# motor de consultas (qssma/consultas.py: filtros, KPIs, agrupamentos e
+# Auditoria; pandas ou Arrow conforme QSSMA_MOTOR) são montados a cada versão publicada.
+# A versão publicada é imutável e existe uma vez por processo: todas as sessões
+# a leem por referência (sem cópia) e guardam só posições e agregados pequenos.
+# Os DataFrames ficam protegidos pelo Copy-on-Write (seção 1); os arrays NumPy
+# das estruturas derivadas são marcados como somente leitura.
+
+def congelar(*objetos):
+    """Marca como somente leitura os arrays NumPy dos objetos (atributos e dicionários inclusive)."""
+    for obj in objetos:
+        if isinstance(obj, np.ndarray):
+            obj.setflags(write=False)
+        elif isinstance(obj, dict):
+            congelar(*obj.values())
+        elif hasattr(obj, '__dict__') and not isinstance(obj, (pd.DataFrame, pd.Series)):
+            congelar(*vars(obj).values())
+
+
+@dataclass(frozen=True)
+class VersaoDados:
+    """Versão publicada dos dados: lista longa + estruturas derivadas."""
+    df: pd.DataFrame
+    cubo: pd.DataFrame
+    celula: np.ndarray
+    indice: IndiceBusca     # Construído sobre as células do cubo
+    consultas: object       # Motor de consultas (qssma/consultas.py): filtros, KPIs, agregados
+    filtros: object         # = consultas.filtros (cascata da barra lateral)
+    versao: int
+    dados_de: datetime      # Modificação da planilha que gerou esta versão
+
+
+# ------------------------------------------------------------------------------
+# 4.7 MONITOR DA PLANILHA (ATUALIZAÇÃO INCREMENTAL)
+# ------------------------------------------------------------------------------
+# Um único monitor por processo observa a pasta da planilha (watchdog). Quando o
+# SESMT salva uma nova versão, ele compara a planilha nova com a anterior linha a
+# linha, pela chave (CONTRATANTE, OBRAS, COORDENADOR, GERENCIA EXECUTIVA), e
+# reprocessa apenas as obras incluídas, alteradas ou removidas.
+# Com a pasta de várias planilhas, a pasta também é observada e a unidade de
+# reprocessamento é o arquivo: só as planilhas alteradas são relidas.
+#
+# Nenhuma sessão espera o ETL (stale-while-revalidate): na inicialização o
+# monitor publica o último resultado gravado no cache Parquet, mesmo que a
+# planilha tenha mudado depois, e relê as planilhas numa thread à parte. A
+# versão nova só entra quando está pronta, de uma vez; se a leitura falhar, a
+# versão anterior continua no ar e a tela mostra o aviso com a data dos dados.
+
+ESPERA_GRAVACAO_SEG = 1.0     # Aguarda o Excel terminar de gravar antes de reler
+INTERVALO_VERIFICACAO = "5s"  # Frequência com que cada sessão confere se há dados novos
+
+
+class MonitorPlanilha:
     """
-    Lê o arquivo Excel, remove colunas indesejadas, transforma a matriz em lista
-    e aplica as regras de negócio estritas (Interno vs Externo vs N/A).
+    Mantém a versão atual da lista longa e a atualiza quando a planilha muda.
+    'versao' é incrementada a cada atualização para que as sessões saibam que
+    precisam redesenhar a tela.
     """
-    arquivo_excel = 'TREINAMENTOS VALORES ATUAIS.xlsx'
-    arquivo_csv = 'TREINAMENTOS_NORMATIVOS.csv'
-    
-    df = None
-    
-    # 4.1 TENTATIVA DE LEITURA
-    try:
-        df = pd.read_excel(arquivo_excel, header=0, engine='openpyxl')
-    except:
+
+    def __init__(self):
+        self.df = None
+        self.atual = None         # VersaoDados publicada (None até a primeira carga)
+        self.versao = 0
+        self.carregando = False   # Leitura das planilhas em andamento (segundo plano)
+        self.erro = None          # Mensagem da última leitura que falhou (None = sem falha)
+        self.avisos = []          # Planilhas ignoradas na última leitura
+        self._assinaturas = None   # Assinaturas da última planilha lida (None = veio do cache)
+        self._colunas = None
+        self._trava = threading.Lock()        # Versão publicada: só trechos curtos
+        self._trava_carga = threading.Lock()  # Uma leitura/atualização das planilhas por vez
+        self._iniciado = False
+        self._temporizador = None
+        self._observador = None
+
+    def dados(self):
+        """
+        Devolve a VersaoDados atual (ou None), sem esperar o ETL. Na primeira
+        chamada publica a última versão do cache Parquet e, se ela não estiver
+        em dia (ou não existir), dispara a leitura das planilhas em segundo plano.
+        """
+        with self._trava:
+            iniciar, self._iniciado = not self._iniciado, True
+        if iniciar:
+            df, dados_de, em_dia = ler_ultima_versao()
+            if df is not None:
+                self._publicar(df, dados_de)
+            if not em_dia:
+                self.carregando = True  # Já visível para quem chegar antes da thread começar
+                threading.Thread(target=self.recarregar, daemon=True).start()
+            self._iniciar_observador()
+        return self.atual
+
+    def estado(self):
+        """(versão, erro, carregando): o que a tela mostra sobre os dados; muda = redesenhar."""
+        return self.versao, self.erro, self.carregando
+
+    def _publicar(self, df, dados_de=None):
+        """
+        Monta as estruturas derivadas (cubo, índice de busca, filtros) fora da
+        trava e troca a versão publicada de uma vez: as sessões veem a versão
+        anterior inteira ou a nova inteira, nunca uma mistura.
+        """
+        with medir('4.6 estruturas', linhas=len(df)):
+            cubo, celula = montar_cubo(df)
+            indice, consultas = IndiceBusca(cubo), criar_consultas(df, cubo)
+            congelar(celula, indice, consultas)
+        with self._trava:
+            self.versao += 1
+            self.df = df
+            self.atual = VersaoDados(
+                df=df, cubo=cubo, celula=celula, indice=indice,
+                consultas=consultas, filtros=consultas.filtros, versao=self.versao,
+                dados_de=dados_de or data_das_planilhas() or datetime.now(),
+            )
+        # Snapshot do dia no histórico (qssma/historico.py), fora do caminho da tela
+        threading.Thread(target=self._registrar_historico, args=(df,), daemon=True).start()
+
+    def _registrar_historico(self, df):
+        """Acrescenta a versão publicada ao histórico; falhas só vão para o log."""
         try:
-            df = pd.read_csv(arquivo_csv, header=0)
-        except:
-            st.error("❌ ERRO CRÍTICO: Nenhum arquivo de dados encontrado na pasta.")
-            return None
-
-    # 4.2 LIMPEZA DE COLUNAS DE TOTAL (Para evitar duplicação de valores)
-    # Remove qualquer coluna que contenha "TOTAL" ou "SOMA" no nome
-    cols_proibidas = [c for c in df.columns if 'TOTAL' in str(c).upper() or 'SOMA' in str(c).upper()]
-    if cols_proibidas:
-        df = df.drop(columns=cols_proibidas)
-
-    # 4.3 VALIDAÇÃO DE ESTRUTURA
-    # Garante que as colunas chaves existem antes de prosseguir
-    colunas_id = ['CONTRATANTE', 'OBRAS', 'COORDENADOR', 'GERENCIA EXECUTIVA']
-    for col in colunas_id:
-        if col not in df.columns:
-            st.error(f"Coluna obrigatória '{col}' não encontrada no arquivo.")
-            return None
-
-    # 4.4 UNPIVOT (TRANSFORMAÇÃO MATRIZ -> LISTA)
-    # Transforma colunas de Treinamento (NR10, NR35...) em linhas de dados
-    df_melted = df.melt(id_vars=colunas_id, var_name='Treinamento', value_name='Valor_Bruto')
-
-    # --------------------------------------------------------------------------
-    # 4.5 MOTOR DE CLASSIFICAÇÃO (LÓGICA DE NEGÓCIO)
-    # --------------------------------------------------------------------------
-    def classificar_seguro(valor):
+            registrar_snapshot(df)
+        except Exception:
+            logger.exception("Falha ao gravar o snapshot do histórico.")
+
+    def _iniciar_observador(self):
+        """Observa a pasta da planilha (o Excel salva via arquivo temporário + rename)."""
+        if self._observador is not None:
+            return
+        monitor = self
+        nomes = {os.path.basename(ARQUIVO_EXCEL), os.path.basename(ARQUIVO_CSV)}
+        pasta = pasta_das_planilhas()
+        pasta_planilhas = os.path.abspath(pasta) if pasta is not None else None  # None: só o arquivo principal
+
+        class _Eventos(FileSystemEventHandler):
+            def on_any_event(self, event):
+                caminhos = [str(getattr(event, 'src_path', '')), str(getattr(event, 'dest_path', ''))]
+                if any(
+                    os.path.basename(c) in nomes
+                    or (pasta_planilhas is not None
+                        and os.path.dirname(os.path.abspath(c)) == pasta_planilhas
+                        and c.lower().endswith(EXTENSOES_PLANILHA)
+                        and not planilha_temporaria(c))  # ~$... aparece só de abrir a planilha
+                    for c in caminhos if c
+                ):
+                    monitor._agendar_atualizacao()
+
+        self._observador = Observer()
+        self._observador.daemon = True
+        pasta_principal = os.path.dirname(os.path.abspath(ARQUIVO_EXCEL)) or '.'
+        self._observador.schedule(_Eventos(), pasta_principal)
+        if pasta_planilhas and os.path.isdir(pasta_planilhas) and pasta_planilhas != os.path.abspath(pasta_principal):
+            self._observador.schedule(_Eventos(), pasta_planilhas)
+        self._observador.start()
+
+    def _agendar_atualizacao(self):
+        """Reinicia a contagem a cada evento, para reler só depois que a gravação terminar."""
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+        self._temporizador = threading.Timer(ESPERA_GRAVACAO_SEG, self.atualizar)
+        self._temporizador.daemon = True
+        self._temporizador.start()
+
+    def recarregar(self):
+        """ETL completo (carregar_lista_longa) em segundo plano; publica só se der certo."""
+        self._em_segundo_plano('4.7 carga', self._recarregar)
+
+    def atualizar(self):
+        """Relê a planilha e aplica as diferenças. Roda na thread do observador."""
+        self._em_segundo_plano('4.7 atualizacao', self._atualizar)
+
+    def _em_segundo_plano(self, etapa, leitura):
         """
-        Analisa o conteúdo da célula e decide:
-        - É Custo? (Externo)
-        - É Saving? (Interno)
-        - É Lixo? (N/A, Vazio -> Ignorar)
+        Executa uma leitura das planilhas (uma por vez), marcando 'carregando'.
+        Em caso de erro mantém os dados anteriores e guarda a mensagem para a tela.
         """
-        # Checa se é vazio/nulo
-        if pd.isna(valor) or str(valor).strip() in ['', '-', 'nan', 'None']:
-            return None, None
-            
-        val_str = str(valor).strip().upper()
-        
-        # REGRA DE EXCLUSÃO: Se for N/A ou Sem Realização, ignora a linha
-        if val_str in ['N/A', 'NA', 'N.A', 'SEM REALIZAÇÃO']:
-            return None, None 
-
-        # REGRA DE SAVING: Se contiver "INTERNO" ou "PRUMO"
-        if 'INTERNO' in val_str or 'PRUMO' in val_str:
-            return 0.0, 'Interno (SESMT)'
-
-        # REGRA DE CUSTO: Se for numérico
-        if isinstance(valor, (int, float)):
-            if valor > 0: return float(valor), 'Externo (Custo)'
-            return None, None
-
-        # REGRA DE CUSTO (STRING): Tenta converter "R$ 1.200,00" para float
+        with self._trava_carga:
+            self.carregando = True
+            try:
+                with medir(etapa):
+                    leitura()
+                self.erro = None
+            except ErroETL as erro:
+                self.erro = str(erro)
+                logger.warning("Leitura da planilha falhou; mantendo dados anteriores: %s", erro)
+            except Exception as erro:
+                self.erro = f"❌ Falha ao ler a planilha: {erro}"
+                logger.exception("Falha ao atualizar a planilha; mantendo dados anteriores.")
+            finally:
+                self.carregando = False
+
+    def _recarregar(self):
+        """Corpo do recarregar: lê todas as fontes (ou o cache em dia) e publica."""
+        avisos = []
         try:
-            limpo = val_str.replace('R$', '').replace(' ', '')
-            if ',' in limpo:
-                limpo = limpo.replace('.', '').replace(',', '.') # Inverte pontuação BR -> US
-            custo = float(limpo)
-            if custo > 0: return custo, 'Externo (Custo)'
-        except:
-            return None, None # Se falhar, considera lixo
-            
-        return None, None
-    # --------------------------------------------------------------------------
-
-    # Aplica a classificação linha a linha
-    resultado = df_melted['Valor_Bruto'].apply(classificar_seguro).tolist()
-    
-    # Cria novas colunas processadas
-    df_melted['Custo_Final'] = [x[0] for x in resultado]
-    df_melted['Status'] = [x[1] for x in resultado]
-    
-    # Remove linhas inválidas (que retornaram None na classificação)
-    df_limpo = df_melted.dropna(subset=['Status'])
-    
-    # Padroniza nomes dos treinamentos (ex: "NR - 10" vira "NR 10")
-    df_limpo['Treinamento'] = df_limpo['Treinamento'].str.replace('NR - ', 'NR ').str.strip()
+            df_longo, planilha = carregar_lista_longa(avisos)
+        finally:
+            self.avisos = avisos
+        self._publicar(df_longo)
+        self._assinaturas = assinar_linhas(planilha) if planilha is not None else None
+        self._colunas = list(planilha.columns) if planilha is not None else None
+
+    def _atualizar(self):
+        """Corpo do atualizar: escolhe o modo (várias planilhas, em blocos ou incremental)."""
+        arquivos = listar_planilhas()
+        if arquivos:
+            # Várias planilhas: as inalteradas saem do cache, as demais são relidas em paralelo
+            df_longo, erros = ingerir_planilhas(arquivos)
+            for arquivo, erro in erros.items():
+                logger.warning("Planilha ignorada (%s): %s", arquivo, erro)
+            self.avisos = [f"⚠️ Planilha ignorada: {erro}" for erro in erros.values()]
+            if df_longo is None:
+                raise ErroETL("❌ ERRO CRÍTICO: Nenhuma planilha válida encontrada na pasta de planilhas.")
+            self._publicar(df_longo)
+            self._assinaturas = None
+            self._colunas = None
+            return
+
+        fonte = fonte_principal()
+        if os.path.exists(fonte) and usar_leitura_em_blocos(fonte):
+            # Planilha grande: sem cópia larga para comparar, refaz o ETL em blocos
+            digital = impressao_digital(fonte)
+            try:
+                df_longo = processar_em_blocos(fonte)
+            except ValueError as erro:
+                raise ErroETL(f"❌ {erro}") from erro
+            self._publicar(df_longo)
+            self._assinaturas = None
+            self._colunas = None
+            gravar_cache_etl(fonte, df_longo, digital)
+            return
+
+        df_novo, fonte, digital = ler_planilha()
+        if df_novo is None:
+            return
+        df_novo = preparar_planilha(df_novo)
+        faltando = [col for col in COLUNAS_ID if col not in df_novo.columns]
+        if faltando:
+            raise ErroETL(f"❌ A planilha salva não tem a(s) coluna(s) obrigatória(s): {', '.join(faltando)}.")
+
+        # (Leituras são serializadas pela _trava_carga: self.df e as assinaturas não mudam no meio)
+        colunas = list(df_novo.columns)
+        if self._assinaturas is None or colunas != self._colunas:
+            # Sem planilha anterior para comparar (ou colunas mudaram): ETL completo
+            df_longo, assinaturas = transformar_planilha(df_novo), assinar_linhas(df_novo)
+        else:
+            df_longo, assinaturas = atualizar_incremental(self.df, df_novo, self._assinaturas)
+
+        if df_longo is not self.df:
+            self._publicar(df_longo)
+        self._assinaturas = assinaturas
+        self._colunas = colunas
+
+        gravar_cache_etl(fonte, df_longo, digital)
+
+
+@st.cache_resource
+def obter_monitor():
+    """Monitor único por processo, compartilhado por todas as sessões."""
+    return MonitorPlanilha()
 
-    # Cria coluna oculta para Busca Global (Concatena todos os campos de texto)
-    df_limpo['BUSCA_GERAL'] = (
-        df_limpo['Treinamento'].astype(str) + " " + 
-        df_limpo['OBRAS'].astype(str) + " " + 
-        df_limpo['COORDENADOR'].astype(str) + " " + 
-        df_limpo['GERENCIA EXECUTIVA'].astype(str) + " " +
-        df_limpo['CONTRATANTE'].astype(str)
-    ).str.upper()
 
-    return df_limpo
+@st.fragment(run_every=INTERVALO_VERIFICACAO)
+def vigiar_atualizacoes():
+    """Redesenha a página desta sessão quando o monitor publica dados novos (ou muda de estado)."""
+    if obter_monitor().estado() != st.session_state.get('estado_dados'):
+        st.rerun()
 
-# Executa o carregamento inicial
-df = carregar_dados_final()
+
+# Executa o carregamento inicial (sem esperar o ETL: vem a última versão válida)
+monitor = obter_monitor()
+base = monitor.dados()
+df = base.df if base is not None else None
+st.session_state['versao_dados'] = base.versao if base is not None else 0  # 0 = nada publicado ainda
+st.session_state['estado_dados'] = monitor.estado()
+
+if base is None:
+    if monitor.erro:
+        st.error(monitor.erro)
+    else:
+        st.info("⏳ Carregando os dados da planilha...")
+elif monitor.erro:
+    st.warning(f"{monitor.erro}\n\nA última leitura da planilha falhou: exibindo a versão anterior, "
+               f"com dados de {base.dados_de:%d/%m/%Y %H:%M}.")
+for aviso in monitor.avisos:
+    st.warning(aviso)
+vigiar_atualizacoes()
+cronometro.marcar('4 etl')
 
 
 # ==============================================================================
@@ -264,65 +705,72 @@ if df is not None:
     # Filtro 1: Busca Global Inteligente
     termo_busca = st.sidebar.text_input("Busca Global", placeholder="Ex: NR 10, Coordenador...", label_visibility="collapsed")
     
-    # Aplica filtro de busca na base global
-    df_global = df.copy()
-    if termo_busca:
-        df_global = df_global[df_global['BUSCA_GERAL'].str.contains(termo_busca.upper(), na=False)]
+    # Aplica filtro de busca na base global (via índice invertido, sem varrer as linhas)
+    # Busca e filtros marcam CÉLULAS do cubo de agregação, não linhas brutas
+    filtros = base.filtros
+    linhas_busca = base.indice.buscar(termo_busca) if termo_busca else None
+    mascara = filtros.mascara_inicial(linhas_busca)
+    # Linhas restantes após cada etapa da cascata (painel de diagnóstico)
+    etapas_filtro = [('Busca Global', linhas_marcadas(base.cubo, mascara))]
     
     st.sidebar.divider()
     
     # Filtros Hierárquicos (Um filtra as opções do próximo)
+    # Todos atuam sobre a mesma máscara de linhas; nenhum DataFrame intermediário é criado
     # 1. Contratante
-    opt_contratante = sorted(df_global['CONTRATANTE'].astype(str).unique())
+    opt_contratante = filtros.opcoes('CONTRATANTE', mascara)
     sel_contratante = st.sidebar.multiselect("Contratante", opt_contratante, default=opt_contratante)
-    df_f1 = df_global[df_global['CONTRATANTE'].isin(sel_contratante)]
+    filtros.aplicar(mascara, 'CONTRATANTE', sel_contratante, opt_contratante)
+    etapas_filtro.append(('Contratante', linhas_marcadas(base.cubo, mascara)))
     
     # 2. Gerência Executiva
-    opt_gerencia = sorted(df_f1['GERENCIA EXECUTIVA'].astype(str).unique())
+    opt_gerencia = filtros.opcoes('GERENCIA EXECUTIVA', mascara)
     sel_gerencia = st.sidebar.multiselect("Gerência Executiva", opt_gerencia, default=opt_gerencia)
-    df_f2 = df_f1[df_f1['GERENCIA EXECUTIVA'].isin(sel_gerencia)]
+    filtros.aplicar(mascara, 'GERENCIA EXECUTIVA', sel_gerencia, opt_gerencia)
+    etapas_filtro.append(('Gerência Executiva', linhas_marcadas(base.cubo, mascara)))
 
     # 3. Coordenador
-    opt_coord = sorted(df_f2['COORDENADOR'].astype(str).unique())
+    opt_coord = filtros.opcoes('COORDENADOR', mascara)
     sel_coord = st.sidebar.multiselect("Coordenador", opt_coord, default=opt_coord)
-    df_f3 = df_f2[df_f2['COORDENADOR'].isin(sel_coord)]
+    filtros.aplicar(mascara, 'COORDENADOR', sel_coord, opt_coord)
+    etapas_filtro.append(('Coordenador', linhas_marcadas(base.cubo, mascara)))
 
     # 4. Obras
-    opt_obras = sorted(df_f3['OBRAS'].astype(str).unique())
+    opt_obras = filtros.opcoes('OBRAS', mascara)
     sel_obras = st.sidebar.multiselect("Obras", opt_obras, default=opt_obras)
-    df_f4 = df_f3[df_f3['OBRAS'].isin(sel_obras)]
+    filtros.aplicar(mascara, 'OBRAS', sel_obras, opt_obras)
+    etapas_filtro.append(('Obras', linhas_marcadas(base.cubo, mascara)))
 
     # 5. Treinamento Específico
-    opt_treino = sorted(df_f4['Treinamento'].astype(str).unique())
+    opt_treino = filtros.opcoes('Treinamento', mascara)
     sel_treino = st.sidebar.multiselect("Treinamentos", opt_treino, default=[])
-    
-    # Dataframe Final pronto para uso
-    df_filtered = df_f4.copy()
     if sel_treino:
-        df_filtered = df_filtered[df_filtered['Treinamento'].isin(sel_treino)]
+        filtros.aplicar(mascara, 'Treinamento', sel_treino)
+    etapas_filtro.append(('Treinamentos', linhas_marcadas(base.cubo, mascara)))
+    
+    # Células do cubo selecionadas (KPIs, gráficos e rankings), posições das
+    # linhas brutas (apenas para as tabelas de detalhe) e KPIs: calculados uma
+    # vez por seleção e versão dos dados, e reaproveitados por todas as sessões
+    selecoes = [
+        ('CONTRATANTE', sel_contratante, opt_contratante),
+        ('GERENCIA EXECUTIVA', sel_gerencia, opt_gerencia),
+        ('COORDENADOR', sel_coord, opt_coord),
+        ('OBRAS', sel_obras, opt_obras),
+        ('Treinamento', sel_treino, None),
+    ]
+    chave = chave_selecao(base.versao, termo_busca, selecoes)
+    cubo_filtrado, linhas_filtradas, kpis = obter_memo_selecoes().obter(chave, lambda: calcular_selecao(base, mascara))
+    cronometro.marcar('5 filtros')
 
 
     # ==========================================================================
     # 6. CÁLCULO DE KPIS (INDICADORES)
     # ==========================================================================
     
-    # KPI Investimento: Soma tudo que é classificado como 'Externo'
-    inv_total = df_filtered[df_filtered['Status'] == 'Externo (Custo)']['Custo_Final'].sum()
-    
-    # KPI Quantidade Interna
-    qtd_interno = len(df_filtered[df_filtered['Status'] == 'Interno (SESMT)'])
-    
-    # KPI Saving: Quantidade Interna * Valor de Mercado (R$ 200,00)
-    # (Para alterar o valor do saving, mude o número 200.00 abaixo)
-    saving = qtd_interno * 200.00
-    
-    # KPI Quantidade Total (Registros Válidos)
-    qtd_total = len(df_filtered)
-    
-    # KPI Maior Investidor: Agrupa por coordenador e vê quem tem maior custo
-    top_inv = df_filtered[df_filtered['Status']=='Externo (Custo)'].groupby('COORDENADOR')['Custo_Final'].sum().sort_values(ascending=False)
-    nome_inv = top_inv.index[0] if not top_inv.empty else "N/A"
-    val_inv = top_inv.iloc[0] if not top_inv.empty else 0
+    # Todos os indicadores e as partições por Status saem de uma única passagem
+    # do motor de consultas (qssma/consultas.py), feita junto com a seleção no memo da seção 5
+    cubo_ext, cubo_int = kpis.externo, kpis.interno
+    cronometro.marcar('6 kpis')
 
 
     # ==========================================================================
@@ -331,37 +779,38 @@ if df is not None:
 
     st.title("COORDENAÇÃO DG | Dashboard QSSMA")
     st.markdown("**Gestão de Custos e Treinamentos Normativos**")
+    st.caption(f"📅 Dados de {base.dados_de:%d/%m/%Y %H:%M}"
+               + (" · atualizando..." if monitor.carregando else ""))
     st.divider()
 
     # --- 7.1 CARTÕES DE MÉTRICAS (LINHA SUPERIOR) ---
     c1, c2, c3, c4 = st.columns(4)
     
-    c1.metric("Investimento Total", formatar_brl(inv_total))
-    c2.metric("Total Registros", qtd_total)
+    c1.metric("Investimento Total", formatar_brl(kpis.inv_total))
+    c2.metric("Total Registros", kpis.qtd_total)
     
     # O texto "Economia: R$..." ficará verde devido ao hack CSS
-    c3.metric("Realizados Internamente", qtd_interno, delta=f"Economia: {formatar_brl(saving)}")
+    c3.metric("Realizados Internamente", kpis.qtd_interno, delta=f"Economia: {formatar_brl(kpis.saving)}")
     
-    c4.metric("Maior Investidor", formatar_brl(val_inv), delta=nome_inv, delta_color="inverse")
+    c4.metric("Maior Investidor", formatar_brl(kpis.val_inv), delta=kpis.nome_inv, delta_color="inverse")
+    cronometro.marcar('7.1 metricas')
 
     st.divider()
 
     # --- 7.2 GRÁFICOS PRINCIPAIS (LINHA DO MEIO) ---
+    # Plotly carregado só aqui: não atrasa métricas e filtros (nem o ETL em lote)
+    from qssma.graficos import figura_top10_custos, figura_status, assinatura_selecao
+    # Figuras já montadas para esta seleção (nesta ou em outra sessão) saem do cache
+    figuras = obter_cache_figuras()
+    selecao = assinatura_selecao(base.versao, mascara)
     col_orig1, col_orig2 = st.columns([2, 1])
     
     # GRÁFICO 1: TOP 10 CUSTOS POR TREINAMENTO
     with col_orig1:
         st.subheader("💰 Top 10 Custos (Por Treinamento)")
-        df_ext = df_filtered[df_filtered['Status'] == 'Externo (Custo)']
-        
-        if not df_ext.empty:
-            df_chart = df_ext.groupby('Treinamento')['Custo_Final'].sum().reset_index().sort_values('Custo_Final', ascending=True).tail(10)
-            df_chart['fmt'] = df_chart['Custo_Final'].apply(formatar_brl)
-            
-            fig = px.bar(df_chart, x='Custo_Final', y='Treinamento', orientation='h', text='fmt')
-            # Cor Marrom para indicar Custo
-            fig.update_traces(marker_color=COR_PRUMO_BROWN, textfont_color='white')
-            fig.update_layout(xaxis_title=None, yaxis_title=None, plot_bgcolor='rgba(0,0,0,0)', uniformtext_minsize=8, uniformtext_mode='hide')
+        # Cor Marrom para indicar Custo
+        fig = figuras.obter(('top10', selecao), lambda: figura_top10_custos(base.consultas.agregar(cubo_ext, ['Treinamento'], 'Custo_Final'), COR_PRUMO_BROWN))
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("Sem custos externos registrados para esta seleção.")
@@ -369,78 +818,22 @@ if df is not None:
     # GRÁFICO 2: PIZZA DE STATUS
     with col_orig2:
         st.subheader("📌 Status da Demanda")
-        df_pie = df_filtered['Status'].value_counts().reset_index()
-        df_pie.columns = ['Status', 'Qtd']
-        
         # Mapa de cores da identidade visual
         cores = {
             'Externo (Custo)': COR_PRUMO_BROWN,   # Marrom
             'Interno (SESMT)': COR_PRUMO_ORANGE,  # Laranja
             'Não Aplicável (N/A)': '#D1D5DB'      # Cinza
         }
-        fig2 = px.pie(df_pie, values='Qtd', names='Status', hole=0.6, color='Status', color_discrete_map=cores)
+        fig2 = figuras.obter(('status', selecao), lambda: figura_status(base.consultas.agregar(cubo_filtrado, ['Status'], 'Qtd'), cores))
         st.plotly_chart(fig2, use_container_width=True)
+    cronometro.marcar('7.2 graficos')
 
     st.divider()
 
     # --- 7.3 RANKINGS COMPARATIVOS (NOVA SEÇÃO) ---
-    st.markdown("### 📈 Rankings Comparativos")
-    
-    # Seletor de Agrupamento Dinâmico
-    col_sel, _ = st.columns([1, 4])
-    with col_sel:
-        agrupar = st.selectbox("Comparar por:", ["COORDENADOR", "OBRAS", "GERENCIA EXECUTIVA"], index=0)
-
-    g_new1, g_new2, g_new3 = st.columns(3)
-
-    # RANKING 1: QUEM GASTA MAIS (EXTERNO)
-    with g_new1:
-        st.markdown("**💸 Quem mais investe? (Externo)**")
-        df_rank_ext = df_filtered[df_filtered['Status']=='Externo (Custo)'].groupby(agrupar)['Custo_Final'].sum().reset_index()
-        df_rank_ext = df_rank_ext.sort_values('Custo_Final', ascending=True).tail(10)
-        
-        if not df_rank_ext.empty:
-            df_rank_ext['fmt'] = df_rank_ext['Custo_Final'].apply(formatar_brl)
-            fig_r1 = px.bar(df_rank_ext, x='Custo_Final', y=agrupar, orientation='h', text='fmt')
-            fig_r1.update_traces(marker_color=COR_PRUMO_BROWN, textfont_color='white') # Marrom
-            fig_r1.update_layout(xaxis_title=None, yaxis_title=None, plot_bgcolor='rgba(0,0,0,0)', margin=dict(l=0,r=0,t=0,b=0))
-            st.plotly_chart(fig_r1, use_container_width=True)
-        else:
-            st.info("Sem dados de custo.")
-
-    # RANKING 2: QUEM GERA MAIS ECONOMIA (INTERNO)
-    with g_new2:
-        st.markdown("**🛡️ Quem mais gera Saving? (Interno)**")
-        df_rank_int = df_filtered[df_filtered['Status']=='Interno (SESMT)'].groupby(agrupar).size().reset_index(name='Qtd')
-        df_rank_int['Valor_Saving'] = df_rank_int['Qtd'] * 200.00
-        df_rank_int = df_rank_int.sort_values('Valor_Saving', ascending=True).tail(10)
-        
-        if not df_rank_int.empty:
-            df_rank_int['fmt'] = df_rank_int['Valor_Saving'].apply(formatar_brl)
-            fig_r2 = px.bar(df_rank_int, x='Valor_Saving', y=agrupar, orientation='h', text='fmt')
-            # Laranja (Identidade visual para Interno)
-            fig_r2.update_traces(marker_color=COR_PRUMO_ORANGE, textfont_color='white') 
-            fig_r2.update_layout(xaxis_title=None, yaxis_title=None, plot_bgcolor='rgba(0,0,0,0)', margin=dict(l=0,r=0,t=0,b=0))
-            st.plotly_chart(fig_r2, use_container_width=True)
-        else:
-            st.info("Sem dados de saving.")
-
-    # RANKING 3: EFICIÊNCIA (VOLUME)
-    with g_new3:
-        st.markdown("**📊 Eficiência (Interno vs Externo)**")
-        # Prepara dados empilhados
-        df_prop = df_filtered.groupby([agrupar, 'Status']).size().reset_index(name='Qtd')
-        # Filtra os 10 maiores volumes totais
-        top_vol = df_prop.groupby(agrupar)['Qtd'].sum().sort_values(ascending=False).head(10).index
-        df_prop = df_prop[df_prop[agrupar].isin(top_vol)]
-        
-        # Cores consistentes
-        cores_prop = {'Externo (Custo)': COR_PRUMO_BROWN, 'Interno (SESMT)': COR_PRUMO_ORANGE}
-        fig_r3 = px.bar(df_prop, x='Qtd', y=agrupar, color='Status', orientation='h', 
-                        color_discrete_map=cores_prop, text='Qtd')
-        fig_r3.update_layout(xaxis_title="Qtd", yaxis_title=None, plot_bgcolor='rgba(0,0,0,0)', 
-                             legend=dict(orientation="h", y=-0.2), margin=dict(l=0,r=0,t=0,b=0))
-        st.plotly_chart(fig_r3, use_container_width=True)
+    # Fragmento: trocar o agrupamento reexecuta só esta seção (ver 3.6)
+    secao_rankings(base.consultas, cubo_filtrado, cubo_ext, cubo_int, selecao)
+    cronometro.marcar('7.3 rankings')
 
     st.divider()
 
@@ -448,14 +841,58 @@ if df is not None:
     tab_det, tab_audit = st.tabs(["📋 Detalhamento da Base", "🕵️‍♂️ Auditoria de Valores"])
     
     with tab_det:
-        # Tabela limpa para consulta
-        df_show = df_filtered[['OBRAS', 'COORDENADOR', 'GERENCIA EXECUTIVA', 'Treinamento', 'Status', 'Custo_Final']].copy()
-        df_show['Custo Visual'] = df_show['Custo_Final'].apply(formatar_brl)
-        st.dataframe(df_show, use_container_width=True, hide_index=True)
+        # Fragmento: filtro, ordenação e página reexecutam só a tabela (ver 3.6)
+        secao_detalhamento(df, linhas_filtradas)
 
     with tab_audit:
         # Tabela para encontrar erros de lançamento no Excel
         st.info("Auditoria de Valores (Top 50 Maiores Custos Unitários)")
-        audit = df_filtered[df_filtered['Status'] == 'Externo (Custo)'].sort_values('Custo_Final', ascending=False).head(50)
-        audit['Valor'] = audit['Custo_Final'].apply(formatar_brl)
-        st.dataframe(audit[['Treinamento', 'OBRAS', 'COORDENADOR', 'Valor']], use_container_width=True)
\ No newline at end of file
+        audit = maiores_custos_externos(base.consultas, linhas_filtradas, 50)
+        st.dataframe(audit[['Treinamento', 'OBRAS', 'COORDENADOR', 'Valor']], use_container_width=True)
+        c_exportar, _ = st.columns([2, 5])
+        with c_exportar:
+            botoes_exportacao("auditoria_qssma", lambda: [audit[COLUNAS_AUDITORIA]], COLUNAS_AUDITORIA, "audit_exportar")
+    cronometro.marcar('7.4 tabelas')
+
+    st.divider()
+
+    # --- 7.5 EVOLUÇÃO HISTÓRICA ---
+    # Lida do histórico de snapshots (qssma/historico.py), sem reabrir planilhas antigas.
+    # Os filtros da barra lateral viram predicados da leitura; a busca não se aplica.
+    from qssma.graficos import figura_tendencia
+    st.subheader("🕒 Evolução do Investimento e Saving")
+    # Dimensão com todas as opções marcadas (ou Treinamento vazio) não restringe a leitura
+    filtros_historico = {
+        col: sel for col, sel, opt in selecoes
+        if (len(sel) != len(opt) if opt is not None else sel)
+    }
+    try:
+        # Com menos de dois dias não há curva: o histórico nem é lido
+        versao_hist = versao_historico()
+        fig_hist = figuras.obter(
+            ('tendencia', versao_hist, tuple(sorted((col, tuple(sorted(sel))) for col, sel in filtros_historico.items()))),
+            lambda: figura_tendencia(tendencia(filtros=filtros_historico), {'Investimento': COR_PRUMO_BROWN, 'Saving': COR_SAVING_GREEN}),
+        ) if versao_hist and len(datas_snapshot()) >= 2 else None
+    except Exception:
+        # Histórico ilegível não derruba a página: o restante do painel segue normal
+        logger.exception("Falha ao ler o histórico de snapshots.")
+        st.info("⚠️ Não foi possível ler o histórico de snapshots (detalhes no log do servidor).")
+    else:
+        if fig_hist is not None:
+            st.plotly_chart(fig_hist, use_container_width=True)
+            st.caption("Um ponto por dia em que a planilha mudou. A Busca Global não se aplica ao histórico.")
+        else:
+            st.info("A evolução aparece a partir do segundo snapshot (gravado a cada carga em que a planilha muda).")
+    cronometro.marcar('7.5 historico')
+
+
+# ==============================================================================
+# 8. DIAGNÓSTICO DE DESEMPENHO (OPCIONAL)
+# ==============================================================================
+# O rerun sempre vai para o log estruturado; o painel só aparece quando ligado.
+registro = cronometro.registrar(versao_dados=st.session_state['versao_dados'], motor=MOTOR_CONSULTAS,
+                                linhas_filtradas=len(linhas_filtradas) if df is not None else 0)
+if mostrar_diagnostico and df is not None:
+    painel_diagnostico(registro, etapas_filtro, {
+        'Lista longa': df, 'Cubo': base.cubo, 'Seleção (posições)': linhas_filtradas,
+    })
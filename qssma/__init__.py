@@ -0,0 +1 @@
+"""Componentes do Dashboard QSSMA que rodam sem o Streamlit (ETL, cache, ingestão)."""
@@ -0,0 +1,97 @@
+"""
+================================================================================
+LINHA DE COMANDO - DASHBOARD QSSMA (PRUMO ENGENHARIA)
+================================================================================
+Roda o ETL e os KPIs sem o Streamlit (cron, deploy, conferência rápida):
+
+    python -m qssma                      # ETL + cache Parquet + resumo dos KPIs
+    python -m qssma --saida artefatos    # também grava lista longa, cubo e KPIs
+    python -m qssma --planilhas "dados/*.xlsx"
+    python -m qssma --planilhas copias/2026-03 --data 2026-03-31   # importa cópia antiga no histórico
+
+O cache Parquet gravado aqui é o mesmo que o dashboard lê na inicialização,
+então rodar este comando após atualizar as planilhas deixa o app pronto.
+Cada execução também acrescenta o snapshot do dia ao histórico (qssma/historico.py).
+================================================================================
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date
+from dataclasses import fields
+
+import pandas as pd
+
+from qssma.etl import PADRAO_PLANILHAS, ErroETL, carregar_lista_longa
+from qssma.kpis import calcular_kpis, montar_cubo
+from qssma.formatacao import formatar_brl
+from qssma.historico import PASTA_HISTORICO, registrar_snapshot
+
+
+def resumo_kpis(kpis):
+    """Indicadores em tipos simples (JSON), sem as partições por Status."""
+    resumo = {}
+    for campo in fields(kpis):
+        valor = getattr(kpis, campo.name)
+        if isinstance(valor, pd.DataFrame):
+            continue
+        resumo[campo.name] = valor.item() if hasattr(valor, 'item') else valor
+    return resumo
+
+
+def gravar_artefatos(pasta, df, cubo, kpis):
+    """Grava lista_longa.parquet, cubo.parquet e kpis.json na pasta de saída."""
+    os.makedirs(pasta, exist_ok=True)
+    df.to_parquet(os.path.join(pasta, 'lista_longa.parquet'), index=False)
+    cubo.to_parquet(os.path.join(pasta, 'cubo.parquet'), index=False)
+    with open(os.path.join(pasta, 'kpis.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump(resumo_kpis(kpis), arquivo, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m qssma', description='ETL e KPIs do Dashboard QSSMA sem Streamlit.')
+    parser.add_argument('--planilhas', default=PADRAO_PLANILHAS,
+                        help="pasta ou glob com uma planilha por gerência (padrão: %(default)s)")
+    parser.add_argument('--saida', help="pasta onde gravar lista_longa.parquet, cubo.parquet e kpis.json")
+    parser.add_argument('--historico', default=PASTA_HISTORICO,
+                        help="pasta do histórico de snapshots, vazio desliga (padrão: %(default)s)")
+    parser.add_argument('--data', type=date.fromisoformat, default=None,
+                        help="data do snapshot (AAAA-MM-DD), para importar cópias antigas em ordem (padrão: hoje)")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    avisos = []
+    try:
+        df, _ = carregar_lista_longa(avisos, padrao=args.planilhas)
+    except ErroETL as erro:
+        print(erro, file=sys.stderr)
+        return 1
+    finally:
+        for aviso in avisos:
+            print(aviso, file=sys.stderr)
+
+    cubo, _ = montar_cubo(df)
+    kpis = calcular_kpis(cubo)
+    if args.saida:
+        gravar_artefatos(args.saida, df, cubo, kpis)
+    try:
+        gravadas = registrar_snapshot(df, args.historico, args.data)
+    except ValueError as erro:
+        print(erro, file=sys.stderr)
+        return 1
+
+    print(f"Registros válidos:       {kpis.qtd_total}")
+    print(f"Investimento total:      {formatar_brl(kpis.inv_total)}")
+    print(f"Realizados internamente: {kpis.qtd_interno} (economia {formatar_brl(kpis.saving)})")
+    print(f"Maior investidor:        {kpis.nome_inv} ({formatar_brl(kpis.val_inv)})")
+    if args.historico:
+        print(f"Histórico:               {gravadas} linha(s) nova(s)/alterada(s)/removida(s) gravada(s)")
+    print(f"Concluído em {time.perf_counter() - inicio:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+================================================================================
+BUSCA GLOBAL - DASHBOARD QSSMA (PRUMO ENGENHARIA)
+================================================================================
+Índice invertido de palavras sobre as células do cubo (sem Streamlit).
+================================================================================
+"""
+
+import numpy as np              # Listas de linhas (CSR) e interseções
+import re                       # Quebra de textos em palavras
+import unicodedata              # Remoção de acentos
+
+
+# ------------------------------------------------------------------------------
+# ÍNDICE DA BUSCA GLOBAL
+# ------------------------------------------------------------------------------
+# Índice invertido: cada palavra (sem acentos, em maiúsculas) aponta para a lista
+# ordenada das linhas que a contêm em algum campo pesquisável. A busca resolve
+# cada termo por prefixo no vocabulário e intersecta as listas (E lógico).
+
+COLUNAS_BUSCA = ['Treinamento', 'OBRAS', 'COORDENADOR', 'GERENCIA EXECUTIVA', 'CONTRATANTE']
+
+
+def normalizar_texto(texto):
+    """Remove acentos e passa para maiúsculas: 'Gerência' -> 'GERENCIA'."""
+    decomposto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).upper()
+
+
+def tokenizar(texto):
+    """Quebra o texto normalizado em palavras: 'NR-10 Elétrica' -> ['NR', '10', 'ELETRICA']."""
+    return re.findall(r'[A-Z0-9]+', normalizar_texto(texto))
+
+
+class IndiceBusca:
+    """
+    Vocabulário ordenado + listas de linhas (formato CSR: as linhas do termo i
+    ficam em linhas[inicio[i]:inicio[i + 1]]). As linhas são posições (iloc).
+    """
+
+    def __init__(self, df):
+        self.total_linhas = len(df)
+        n = max(len(df), 1)
+
+        # 1) Palavras de cada categoria: cada texto distinto é tokenizado uma única vez
+        colunas = []
+        for col in COLUNAS_BUSCA:
+            serie = df[col].astype('category')
+            tokens = [set(tokenizar(valor)) for valor in serie.cat.categories]
+            colunas.append((serie.cat.codes.to_numpy(), tokens))
+
+        # Vocabulário em ordem alfabética (permite busca por prefixo com searchsorted)
+        self.vocabulario = np.array(sorted(set().union(*(t for _, tk in colunas for t in tk))), dtype=str)
+        numero = {token: i for i, token in enumerate(self.vocabulario)}
+
+        # 2) Pares (palavra, linha) codificados como palavra * n + linha
+        pares = []
+        for codigos, tokens in colunas:
+            # Linhas agrupadas por código: as da categoria k são ordem[inicio_cat[k]:][:contagem[k]]
+            ordem = np.argsort(codigos, kind='stable')
+            ordem = ordem[codigos[ordem] >= 0]
+            contagem = np.bincount(codigos[codigos >= 0], minlength=len(tokens))
+            inicio_cat = np.cumsum(contagem) - contagem
+
+            cat_par = np.array([k for k, toks in enumerate(tokens) for _ in toks], dtype=np.int64)
+            termo_par = np.array([numero[t] for toks in tokens for t in toks], dtype=np.int64)
+            if len(cat_par) == 0:
+                continue
+
+            # Expande cada par para todas as linhas da categoria (sem laço por linha)
+            tamanhos = contagem[cat_par]
+            deslocamento = np.arange(tamanhos.sum()) - np.repeat(np.cumsum(tamanhos) - tamanhos, tamanhos)
+            linhas = ordem[np.repeat(inicio_cat[cat_par], tamanhos) + deslocamento]
+            pares.append(np.repeat(termo_par, tamanhos) * n + linhas)
+
+        # 3) Ordena por (palavra, linha) e elimina repetições (mesma palavra em 2 colunas)
+        pares = np.concatenate(pares) if pares else np.array([], dtype=np.int64)
+        pares.sort()
+        pares = pares[np.concatenate([[True], pares[1:] != pares[:-1]])] if len(pares) else pares
+        termos, linhas = np.divmod(pares, n)
+        self.linhas = linhas.astype(np.int32)
+        self.inicio = np.searchsorted(termos, np.arange(len(self.vocabulario) + 1))
+
+    def _linhas_do_prefixo(self, prefixo):
+        """União (ordenada) das listas de todas as palavras que começam com o prefixo."""
+        lo, hi = np.searchsorted(self.vocabulario, [prefixo, prefixo + '\uffff'])
+        trecho = self.linhas[self.inicio[lo]:self.inicio[hi]]
+        if hi - lo <= 1:
+            return trecho
+        # Várias palavras: une marcando as linhas num vetor booleano (mais barato que ordenar)
+        marcadas = np.zeros(self.total_linhas, dtype=bool)
+        marcadas[trecho] = True
+        return np.flatnonzero(marcadas).astype(np.int32)
+
+    def buscar(self, termo):
+        """
+        Posições das linhas que contêm TODAS as palavras digitadas (cada uma como
+        prefixo). Retorna None quando o termo não tem palavras (= sem filtro).
+        """
+        prefixos = tokenizar(termo)
+        if not prefixos:
+            return None
+        listas = sorted((self._linhas_do_prefixo(p) for p in set(prefixos)), key=len)
+        resultado = listas[0]
+        for lista in listas[1:]:
+            if len(resultado) == 0:
+                break
+            resultado = np.intersect1d(resultado, lista, assume_unique=True)
+        return resultado
@@ -0,0 +1,203 @@
+"""
+================================================================================
+MOTORES DE CONSULTA - DASHBOARD QSSMA (PRUMO ENGENHARIA)
+================================================================================
+Filtros em cascata, seleção + KPIs, agrupamentos dos gráficos/rankings e a
+ordenação da Auditoria, com duas implementações de mesma interface:
+
+    pandas  (padrão)  máscaras por código (MotorFiltros) e groupby do pandas
+    arrow             cubo e lista longa como pa.Table; filtros, partições por
+                      Status, agrupamentos e Top N pelos kernels do Arrow
+                      (pyarrow.compute, multithread)
+
+Escolhido na inicialização com QSSMA_MOTOR=pandas|arrow. Nos dois casos só
+resultados pequenos (agregados dos gráficos, linhas da Auditoria) viram pandas.
+A Busca Global continua no índice invertido (qssma/busca.py): ela devolve
+posições de células, que entram na máscara como qualquer filtro.
+================================================================================
+"""
+
+import os                       # Motor escolhido via variável de ambiente
+import numpy as np              # Máscara de células e posições das linhas
+import pandas as pd             # Resultados pequenos entregues aos gráficos
+import pyarrow as pa            # Tabelas colunares do motor Arrow
+import pyarrow.compute as pc    # Kernels vetorizados (filtro, is_in, group_by, Top N)
+
+from qssma.kpis import Indicadores, VALOR_SAVING_UNITARIO, calcular_kpis
+from qssma.filtros import COLUNAS_FILTRO, MotorFiltros
+
+MOTOR_CONSULTAS = os.environ.get('QSSMA_MOTOR', 'pandas')
+STATUS_EXTERNO = 'Externo (Custo)'
+STATUS_INTERNO = 'Interno (SESMT)'
+
+
+# ------------------------------------------------------------------------------
+# MOTOR PANDAS (PADRÃO)
+# ------------------------------------------------------------------------------
+
+class ConsultasPandas:
+    """Consultas sobre o cubo em pandas; filtros por código (qssma/filtros.py)."""
+
+    nome = 'pandas'
+
+    def __init__(self, df, cubo):
+        self.df = df
+        self.cubo = cubo
+        self.filtros = MotorFiltros(cubo)
+
+    def selecao(self, mascara):
+        """(células do cubo marcadas, Indicadores com as partições por Status)."""
+        cubo_filtrado = self.cubo[mascara]
+        return cubo_filtrado, calcular_kpis(cubo_filtrado)
+
+    def agregar(self, tabela, chaves, valor):
+        """Soma de 'valor' por 'chaves' (tabela = seleção ou partição), em pandas."""
+        return tabela.groupby(chaves, observed=True)[valor].sum().reset_index()
+
+    def maiores_custos_externos(self, linhas, quantidade):
+        """
+        Linhas externas de maior custo entre as posições da seleção, da maior
+        para a menor. Ordena só os custos; apenas as linhas exibidas são copiadas.
+        """
+        status = self.df['Status']
+        externo = status.cat.codes.to_numpy()[linhas] == status.cat.categories.get_loc(STATUS_EXTERNO)
+        custos = pd.Series(self.df['Custo_Final'].to_numpy()[linhas[externo]], index=linhas[externo])
+        return self.df.iloc[custos.sort_values(ascending=False).index[:quantidade]].copy()
+
+
+# ------------------------------------------------------------------------------
+# MOTOR ARROW
+# ------------------------------------------------------------------------------
+# O cubo vira uma pa.Table (dimensões dictionary, como o Categorical) e a lista
+# longa guarda em Arrow só as colunas que a Auditoria ordena. A máscara de
+# células continua um vetor NumPy (mesma interface do MotorFiltros: a busca,
+# o memo e o cache de figuras não mudam); cada filtro é um is_in sobre a coluna
+# e cada agrupamento um Table.group_by, convertido em pandas só no final.
+
+class FiltrosArrow:
+    """Cascata da barra lateral com pc.is_in/pc.unique; mesma interface do MotorFiltros."""
+
+    def __init__(self, tabela):
+        # Dimensões como texto: opções e seleções usam os mesmos nomes str() do
+        # MotorFiltros, mesmo quando a planilha traz números (ex: OBRAS 101, 102)
+        self.tabela = pa.table({col: self._como_texto(tabela[col]) for col in COLUNAS_FILTRO})
+        self.total_linhas = tabela.num_rows
+        self.usados = {col: self._valores(self.tabela[col]) for col in COLUNAS_FILTRO}
+
+    @staticmethod
+    def _como_texto(coluna):
+        """Coluna dictionary com os valores convertidos por str() (o dicionário é pequeno)."""
+        if not pa.types.is_dictionary(coluna.type):
+            coluna = pc.dictionary_encode(coluna)
+        if pa.types.is_string(coluna.type.value_type):
+            return coluna
+        tipo = pa.dictionary(coluna.type.index_type, pa.string())
+        return pa.chunked_array([
+            pa.DictionaryArray.from_arrays(
+                parte.indices, pa.array([str(v) for v in parte.dictionary.to_pylist()], type=pa.string()),
+            )
+            for parte in coluna.chunks
+        ], type=tipo)
+
+    @staticmethod
+    def _valores(coluna):
+        """Valores distintos (não nulos) da coluna, em ordem alfabética."""
+        distintos = pc.unique(coluna)
+        if pa.types.is_dictionary(distintos.type):
+            distintos = distintos.dictionary_decode()
+        return sorted(distintos.drop_null().to_pylist())
+
+    def mascara_inicial(self, linhas=None):
+        """Máscara com todas as linhas (ou apenas as posições informadas, ex: resultado da busca)."""
+        if linhas is None:
+            return np.ones(self.total_linhas, dtype=bool)
+        mascara = np.zeros(self.total_linhas, dtype=bool)
+        mascara[linhas] = True
+        return mascara
+
+    def opcoes(self, col, mascara):
+        """Valores da dimensão presentes nas linhas marcadas, em ordem alfabética."""
+        if mascara.all():
+            return list(self.usados[col])
+        return self._valores(pc.filter(self.tabela[col], pa.array(mascara)))
+
+    def aplicar(self, mascara, col, selecionados, opcoes=None):
+        """E lógico (no próprio vetor) entre a máscara e a pertinência aos valores selecionados."""
+        coluna = self.tabela[col]
+        if opcoes is not None and len(selecionados) == len(opcoes):
+            if coluna.null_count:
+                mascara &= pc.is_valid(coluna).to_numpy(zero_copy_only=False)
+            return mascara
+        dentro = pc.is_in(coluna, value_set=pa.array(list(selecionados), type=pa.string()))
+        mascara &= dentro.fill_null(False).to_numpy(zero_copy_only=False)
+        return mascara
+
+
+class ConsultasArrow:
+    """Consultas sobre o cubo e a lista longa em Arrow (pyarrow.compute)."""
+
+    nome = 'arrow'
+
+    def __init__(self, df, cubo):
+        self.df = df
+        self.tabela = pa.Table.from_pandas(cubo, preserve_index=False)
+        self.longo = pa.Table.from_pandas(df[['Status', 'Custo_Final']], preserve_index=False)
+        self.tipos = cubo.dtypes  # Categorias originais, reaplicadas nos agregados
+        self.filtros = FiltrosArrow(self.tabela)
+
+    def _somar(self, tabela, chaves, valores):
+        """group_by + sum em Arrow; devolve pandas com os nomes e categorias do cubo."""
+        soma = tabela.group_by(chaves).aggregate([(v, 'sum') for v in valores])
+        resultado = soma.rename_columns([c.removesuffix('_sum') for c in soma.column_names]).to_pandas()
+        return resultado.astype({c: self.tipos[c] for c in chaves})
+
+    def selecao(self, mascara):
+        """(células marcadas como pa.Table, Indicadores com as partições em Arrow)."""
+        tabela = self.tabela.filter(pa.array(mascara))
+        externo = tabela.filter(pc.equal(tabela['Status'], STATUS_EXTERNO))
+        interno = tabela.filter(pc.equal(tabela['Status'], STATUS_INTERNO))
+
+        # KPI Maior Investidor: mesma ordenação do calcular_kpis (empates inclusive)
+        top_inv = (self._somar(externo, ['COORDENADOR'], ['Custo_Final'])
+                   .sort_values('COORDENADOR').set_index('COORDENADOR')['Custo_Final']
+                   .sort_values(ascending=False))
+        qtd_interno = int(pc.sum(interno['Qtd']).as_py() or 0)
+
+        return tabela, Indicadores(
+            inv_total=pc.sum(externo['Custo_Final']).as_py() or 0.0,
+            qtd_interno=qtd_interno,
+            saving=qtd_interno * VALOR_SAVING_UNITARIO,
+            qtd_total=int(pc.sum(externo['Qtd']).as_py() or 0) + qtd_interno,
+            nome_inv=str(top_inv.index[0]) if not top_inv.empty else "N/A",
+            val_inv=top_inv.iloc[0] if not top_inv.empty else 0,
+            externo=externo,
+            interno=interno,
+        )
+
+    def agregar(self, tabela, chaves, valor):
+        """Soma de 'valor' por 'chaves' (tabela = seleção ou partição), em Arrow."""
+        return self._somar(tabela, chaves, [valor])
+
+    def maiores_custos_externos(self, linhas, quantidade):
+        """Top N dos custos externos das posições da seleção (pc.select_k_unstable)."""
+        posicoes = pa.array(linhas)
+        trecho = self.longo.take(posicoes).append_column('posicao', posicoes)
+        externo = trecho.filter(pc.equal(trecho['Status'], STATUS_EXTERNO))
+        if externo.num_rows == 0:
+            return self.df.iloc[[]].copy()
+        topo = pc.select_k_unstable(externo, k=min(quantidade, externo.num_rows),
+                                    sort_keys=[('Custo_Final', 'descending')])
+        return self.df.iloc[externo['posicao'].take(topo).to_numpy()].copy()
+
+
+# ------------------------------------------------------------------------------
+# ESCOLHA DO MOTOR
+# ------------------------------------------------------------------------------
+MOTORES = {'pandas': ConsultasPandas, 'arrow': ConsultasArrow}
+
+
+def criar_consultas(df, cubo, motor=MOTOR_CONSULTAS):
+    """Motor de consultas da versão publicada (df = lista longa, cubo = qssma.kpis.montar_cubo)."""
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de consultas desconhecido: {motor!r} (use {' ou '.join(MOTORES)})")
+    return MOTORES[motor](df, cubo)
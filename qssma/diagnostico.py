@@ -0,0 +1,121 @@
+"""
+================================================================================
+DIAGNÓSTICO DE DESEMPENHO - DASHBOARD QSSMA (PRUMO ENGENHARIA)
+================================================================================
+Medição leve do tempo de cada etapa (ETL, filtros, KPIs, gráficos, tabelas),
+contadores de acerto/falta dos caches e uso de memória dos DataFrames.
+
+Cada medição vira uma linha de log JSON no logger 'qssma.desempenho', ex:
+    {"evento": "etapa", "etapa": "etl.transformar", "segundos": 0.0654, ...}
+    {"evento": "rerun", "total_s": 0.41, "etapas": {"5 filtros": 0.002, ...}}
+O painel do dashboard (QSSMA_DIAGNOSTICO=1 ou ?diagnostico=1 na URL) lê os
+mesmos dados. Não depende do Streamlit.
+================================================================================
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger('qssma.desempenho')
+
+_trava = threading.Lock()
+_contadores_cache = Counter()   # (cache, 'acertos' | 'faltas') -> quantidade
+_ultimas_etapas = {}            # Última duração de cada etapa medida com medir()
+
+
+def configurar_log():
+    """Envia os logs de desempenho para o terminal (stderr), uma vez por processo."""
+    if not logger.handlers:
+        saida = logging.StreamHandler()
+        saida.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+        logger.addHandler(saida)
+    logger.setLevel(logging.INFO)
+
+
+def registrar_evento(evento, **campos):
+    """Grava uma linha de log estruturada (JSON) com o evento e seus campos."""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({'evento': evento, **campos}, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def medir(etapa, **campos):
+    """
+    Mede o bloco 'with' e registra a duração (log + últimas durações por etapa).
+    Usado nas etapas que podem rodar fora de um rerun (ETL, monitor da planilha).
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        with _trava:
+            _ultimas_etapas[etapa] = duracao
+        registrar_evento('etapa', etapa=etapa, segundos=round(duracao, 6), **campos)
+
+
+def ultimas_etapas():
+    """Cópia de {etapa: segundos} com a última medição de cada etapa do processo."""
+    with _trava:
+        return dict(_ultimas_etapas)
+
+
+def contar_cache(cache, acerto):
+    """Conta um acerto (True) ou uma falta (False) do cache indicado."""
+    with _trava:
+        _contadores_cache[(cache, 'acertos' if acerto else 'faltas')] += 1
+
+
+def contadores_cache():
+    """{cache: {'acertos': n, 'faltas': n}} acumulado desde o início do processo."""
+    with _trava:
+        itens = list(_contadores_cache.items())
+    resumo = {}
+    for (cache, tipo), quantidade in itens:
+        resumo.setdefault(cache, {'acertos': 0, 'faltas': 0})[tipo] = quantidade
+    return resumo
+
+
+def memoria_mb(df):
+    """Memória ocupada pelo DataFrame (inclui os textos) ou array NumPy, em MB; None se df for None."""
+    if df is None:
+        return None
+    if hasattr(df, 'memory_usage'):
+        return df.memory_usage(deep=True).sum() / 1024 ** 2
+    return df.nbytes / 1024 ** 2
+
+
+class Cronometro:
+    """
+    Cronômetro de voltas para o script do dashboard: marcar(etapa) atribui à
+    etapa o tempo decorrido desde a marcação anterior, sem precisar envolver
+    cada seção num bloco 'with'.
+    """
+
+    def __init__(self):
+        self.inicio = self._marca = time.perf_counter()
+        self.etapas = {}
+
+    def marcar(self, etapa):
+        """Fecha a volta atual na etapa indicada (somando, se ela já existir)."""
+        agora = time.perf_counter()
+        self.etapas[etapa] = self.etapas.get(etapa, 0.0) + (agora - self._marca)
+        self._marca = agora
+
+    def total(self):
+        """Tempo desde a criação do cronômetro, em segundos."""
+        return time.perf_counter() - self.inicio
+
+    def registrar(self, **campos):
+        """Grava o rerun completo no log e devolve o registro (para o histórico do painel)."""
+        registro = {
+            'total_s': round(self.total(), 6),
+            'etapas': {etapa: round(segundos, 6) for etapa, segundos in self.etapas.items()},
+            **campos,
+        }
+        registrar_evento('rerun', **registro)
+        return registro
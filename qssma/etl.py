@@ -0,0 +1,764 @@
+"""
+================================================================================
+MOTOR DE ETL - DASHBOARD QSSMA (PRUMO ENGENHARIA)
+================================================================================
+Leitura, limpeza, classificação e cache das planilhas de treinamentos.
+Não depende do Streamlit: é importado pelo dashboard_app.py e também pelos
+processos auxiliares da ingestão paralela (que não podem importar o app).
+================================================================================
+"""
+
+import pandas as pd             # Manipulação de dados (ETL)
+import numpy as np              # Operações vetorizadas (classificação em lote)
+import pyarrow as pa            # Tabelas colunares (cache do ETL em Parquet)
+import pyarrow.parquet as pq    # Leitura/gravação de arquivos Parquet
+import os                       # Caminhos e metadados de arquivos
+import glob                     # Localização das planilhas por padrão (pasta/*.xlsx)
+import json                     # Metadados do cache (impressão digital da planilha)
+import hashlib                  # Hash do conteúdo da planilha
+import multiprocessing          # Contexto 'spawn' dos processos da ingestão
+from datetime import datetime   # Data dos dados (modificação da planilha)
+from openpyxl import load_workbook  # Leitura linha a linha de planilhas grandes
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from qssma.diagnostico import medir, contar_cache  # Tempos por etapa e acertos do cache
+
+
+# ------------------------------------------------------------------------------
+# MOTOR DE CLASSIFICAÇÃO (LÓGICA DE NEGÓCIO)
+# ------------------------------------------------------------------------------
+def classificar_seguro(valor):
+    """
+    Analisa o conteúdo da célula e decide:
+    - É Custo? (Externo)
+    - É Saving? (Interno)
+    - É Lixo? (N/A, Vazio -> Ignorar)
+
+    Versão de referência (célula a célula). O ETL usa classificar_vetorizado,
+    que deve produzir exatamente o mesmo resultado que esta função.
+    """
+    # Checa se é vazio/nulo
+    if pd.isna(valor) or str(valor).strip() in ['', '-', 'nan', 'None']:
+        return None, None
+
+    val_str = str(valor).strip().upper()
+
+    # REGRA DE EXCLUSÃO: Se for N/A ou Sem Realização, ignora a linha
+    if val_str in ['N/A', 'NA', 'N.A', 'SEM REALIZAÇÃO']:
+        return None, None
+
+    # REGRA DE SAVING: Se contiver "INTERNO" ou "PRUMO"
+    if 'INTERNO' in val_str or 'PRUMO' in val_str:
+        return 0.0, 'Interno (SESMT)'
+
+    # REGRA DE CUSTO: Se for numérico
+    if isinstance(valor, (int, float)):
+        if valor > 0: return float(valor), 'Externo (Custo)'
+        return None, None
+
+    # REGRA DE CUSTO (STRING): Tenta converter "R$ 1.200,00" para float
+    try:
+        limpo = val_str.replace('R$', '').replace(' ', '')
+        if ',' in limpo:
+            limpo = limpo.replace('.', '').replace(',', '.') # Inverte pontuação BR -> US
+        custo = float(limpo)
+        if custo > 0: return custo, 'Externo (Custo)'
+    except:
+        return None, None # Se falhar, considera lixo
+
+    return None, None
+
+
+def _converter_numero(texto):
+    """Conversão pontual com float() para os textos que o parser vetorizado recusou."""
+    try:
+        return float(texto)
+    except:
+        return np.nan
+
+
+def _classificar_distintos(distintos):
+    """
+    Aplica as regras de negócio com operações de string do pandas sobre os
+    valores DISTINTOS de uma coluna (sem nulos). Retorna (custo, status) como
+    arrays NumPy na mesma ordem de entrada.
+    """
+    # Números (e textos numéricos simples como "400") são convertidos em lote.
+    # Booleanos também: True vira 1.0, como na regra original.
+    # (copy=True: o vetor é preenchido abaixo; com Copy-on-Write o to_numpy() seria somente leitura)
+    numeros = pd.to_numeric(distintos, errors='coerce').to_numpy(dtype=float, na_value=np.nan, copy=True)
+    textos = np.isnan(numeros)
+
+    bruto = distintos.astype(str)
+    aparado = bruto.str.strip()
+    texto = aparado.str.upper()
+
+    # REGRA DE EXCLUSÃO: vazios, N/A e Sem Realização
+    descartar = (
+        aparado.isin(['', '-', 'nan', 'None'])
+        | texto.isin(['N/A', 'NA', 'N.A', 'SEM REALIZAÇÃO'])
+    ).to_numpy()
+
+    # REGRA DE SAVING: contém "INTERNO" ou "PRUMO"
+    interno = ~descartar & (
+        texto.str.contains('INTERNO', regex=False) | texto.str.contains('PRUMO', regex=False)
+    ).to_numpy()
+
+    # REGRA DE CUSTO (STRING): converte "R$ 1.200,00" para float
+    limpo = texto.str.replace('R$', '', regex=False).str.replace(' ', '', regex=False)
+    formato_br = limpo.str.contains(',', regex=False)
+    limpo = limpo.where(~formato_br, limpo.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    numeros[textos] = pd.to_numeric(limpo[textos], errors='coerce').to_numpy(dtype=float)
+
+    # O que o parser do pandas recusou ainda passa pelo float() do Python
+    pendentes = np.isnan(numeros) & textos & ~descartar & ~interno
+    if pendentes.any():
+        numeros[pendentes] = [_converter_numero(t) for t in limpo[pendentes]]
+
+    externo = ~descartar & ~interno & (numeros > 0)
+    custo = np.where(interno, 0.0, np.where(externo, numeros, np.nan))
+    status = np.where(interno, 'Interno (SESMT)', np.where(externo, 'Externo (Custo)', None))
+    return custo, status
+
+
+def classificar_vetorizado(valores):
+    """
+    Mesmas regras do classificar_seguro, aplicadas na coluna inteira em lote.
+    A coluna é fatorada (cada valor distinto vira um código inteiro), as regras
+    rodam só nos valores distintos - poucos numa matriz de treinamentos - e o
+    resultado é espalhado de volta para as linhas por indexação NumPy.
+    Retorna as séries (Custo_Final, Status) alinhadas ao índice de entrada.
+    """
+    valores = pd.Series(valores)
+
+    # Atalho: coluna 100% numérica não precisa de nenhuma operação de texto
+    if pd.api.types.is_numeric_dtype(valores.dtype):
+        numeros = valores.to_numpy(dtype=float, na_value=np.nan)
+        externo = numeros > 0
+        custo = np.where(externo, numeros, np.nan)
+        status = np.where(externo, 'Externo (Custo)', None)
+        return pd.Series(custo, index=valores.index), pd.Series(status, index=valores.index)
+
+    # Nulos recebem o código -1, que aponta para a posição extra "vazia" no final
+    codigos, distintos = pd.factorize(valores)
+    custo_distinto, status_distinto = _classificar_distintos(pd.Series(distintos, dtype=object))
+    custo = np.append(custo_distinto, np.nan)[codigos]
+    status = np.append(status_distinto, None)[codigos]
+
+    return pd.Series(custo, index=valores.index), pd.Series(status, index=valores.index)
+
+
+# ------------------------------------------------------------------------------
+# CACHE COLUNAR DO ETL (PARQUET)
+# ------------------------------------------------------------------------------
+# O resultado limpo do ETL é gravado em Parquet ao lado da planilha. Enquanto a
+# planilha não mudar (tamanho, data de modificação e hash do conteúdo), os
+# próximos carregamentos leem o Parquet em vez de refazer leitura + classificação.
+
+PASTA_CACHE_ETL = '.cache_etl'
+VERSAO_ETL = 4  # Incrementar sempre que o formato da saída do ETL mudar (invalida caches antigos)
+
+
+def impressao_digital(caminho, calcular_hash=True):
+    """
+    Identifica a versão de um arquivo-fonte: tamanho, data de modificação e
+    hash SHA-256 do conteúdo (opcional, pois exige ler o arquivo inteiro).
+    """
+    info = os.stat(caminho)
+    digital = {
+        'versao_etl': VERSAO_ETL,
+        'tamanho': info.st_size,
+        'mtime_ns': info.st_mtime_ns,
+        'sha256': None,
+    }
+    if calcular_hash:
+        h = hashlib.sha256()
+        with open(caminho, 'rb') as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(bloco)
+        digital['sha256'] = h.hexdigest()
+    return digital
+
+
+def _caminho_cache_etl(fonte):
+    """Ex: 'dados/PLANILHA.xlsx' -> 'dados/.cache_etl/PLANILHA.xlsx.parquet'"""
+    pasta = os.path.dirname(os.path.abspath(fonte))
+    return os.path.join(pasta, PASTA_CACHE_ETL, os.path.basename(fonte) + '.parquet')
+
+
+def ler_cache_etl(fonte):
+    """
+    Devolve o DataFrame do cache se ele corresponder à versão atual da fonte.
+    Caso contrário (ou se o cache estiver ilegível) devolve None.
+    """
+    destino = _caminho_cache_etl(fonte)
+    if not os.path.exists(fonte) or not os.path.exists(destino):
+        return None
+    try:
+        if not _cache_em_dia(fonte, _digital_do_cache(destino)):
+            return None
+        return pd.read_parquet(destino)
+    except Exception:
+        return None
+
+
+def _digital_do_cache(destino):
+    """Impressão digital da fonte gravada nos metadados do Parquet."""
+    metadados = pq.read_schema(destino).metadata or {}
+    return json.loads(metadados.get(b'impressao_digital', b'{}'))
+
+
+def _cache_em_dia(fonte, gravada):
+    """True se a impressão digital gravada ainda corresponde à fonte atual."""
+    atual = impressao_digital(fonte, calcular_hash=False)
+
+    # Versão do ETL ou tamanho diferente: mudou com certeza, nem precisa do hash
+    if gravada.get('versao_etl') != VERSAO_ETL or gravada.get('tamanho') != atual['tamanho']:
+        return False
+    # Data de modificação diferente (ex: arquivo copiado num deploy): o hash decide
+    if gravada.get('mtime_ns') != atual['mtime_ns']:
+        return gravada.get('sha256') == impressao_digital(fonte)['sha256']
+    return True
+
+
+def gravar_cache_etl(fonte, df, digital):
+    """
+    Grava o resultado do ETL em Parquet junto com a impressão digital da fonte
+    (calculada ANTES da leitura, para que uma alteração durante o ETL invalide o cache).
+    A gravação é atômica (arquivo temporário + rename); falhas apenas desativam o cache.
+    """
+    destino = _caminho_cache_etl(fonte)
+    temporario = destino + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        tabela = pa.Table.from_pandas(df)
+        metadados = dict(tabela.schema.metadata or {})
+        metadados[b'impressao_digital'] = json.dumps(digital).encode()
+        pq.write_table(tabela.replace_schema_metadata(metadados), temporario)
+        os.replace(temporario, destino)
+    except Exception:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+ARQUIVO_EXCEL = 'TREINAMENTOS VALORES ATUAIS.xlsx'
+ARQUIVO_CSV = 'TREINAMENTOS_NORMATIVOS.csv'
+COLUNAS_ID = ['CONTRATANTE', 'OBRAS', 'COORDENADOR', 'GERENCIA EXECUTIVA']
+
+# Dimensões guardadas como Categorical: cada texto distinto fica num dicionário
+# e as linhas guardam apenas um código inteiro (filtros e groupbys usam os códigos)
+COLUNA_ORIGEM = 'Arquivo_Origem'  # Só existe na ingestão de várias planilhas
+COLUNAS_CATEGORICAS = COLUNAS_ID + ['Treinamento', 'Status', COLUNA_ORIGEM]
+TIPO_STATUS = pd.CategoricalDtype(['Externo (Custo)', 'Interno (SESMT)'])
+
+
+def fonte_principal():
+    """Arquivo único de dados: o Excel oficial se existir, senão o CSV."""
+    return ARQUIVO_EXCEL if os.path.exists(ARQUIVO_EXCEL) else ARQUIVO_CSV
+
+
+def ler_planilha():
+    """
+    4.1 TENTATIVA DE LEITURA: Excel oficial, com o CSV como alternativa.
+    Retorna (df, fonte, impressão digital) ou (None, None, None) se não houver arquivo.
+    A impressão digital é calculada ANTES da leitura (ver gravar_cache_etl).
+    """
+    try:
+        digital = impressao_digital(ARQUIVO_EXCEL)
+        return pd.read_excel(ARQUIVO_EXCEL, header=0, engine='openpyxl'), ARQUIVO_EXCEL, digital
+    except:
+        try:
+            digital = impressao_digital(ARQUIVO_CSV)
+            return pd.read_csv(ARQUIVO_CSV, header=0), ARQUIVO_CSV, digital
+        except:
+            return None, None, None
+
+
+def preparar_planilha(df):
+    """
+    4.2 LIMPEZA DE COLUNAS DE TOTAL (Para evitar duplicação de valores)
+    Remove qualquer coluna que contenha "TOTAL" ou "SOMA" no nome.
+    """
+    cols_proibidas = [c for c in df.columns if 'TOTAL' in str(c).upper() or 'SOMA' in str(c).upper()]
+    if cols_proibidas:
+        df = df.drop(columns=cols_proibidas)
+    return df
+
+
+def transformar_planilha(df):
+    """
+    Transforma a matriz (uma linha por obra, uma coluna por treinamento) na
+    lista longa usada pelo dashboard, já classificada. Recebe a planilha
+    preparada e validada; pode receber apenas um subconjunto das linhas.
+    Mesmo resultado (linhas, ordem e índice) de um melt + dropna(Status).
+    """
+    # 4.4 UNPIVOT ESPARSO (TRANSFORMAÇÃO MATRIZ -> LISTA)
+    # A matriz é quase toda vazia/'-'/N/A. Em vez de gerar uma linha completa por
+    # célula (melt: dimensões + nome do treinamento repetidos) e descartar a
+    # maioria depois, as células são classificadas direto na matriz e só as
+    # Interno/Externo viram coordenadas (linha, coluna) - o formato COO de uma
+    # matriz esparsa - a partir das quais a lista longa é montada.
+    posicoes_valor = [i for i, c in enumerate(df.columns) if c not in COLUNAS_ID]
+    total_linhas = len(df)
+
+    # Células empilhadas coluna a coluna, como o melt faz com Valor_Bruto (mesma
+    # ordem e promoção de tipos), mas sem replicar dimensões nem nomes
+    if posicoes_valor:
+        celulas = pd.concat([df.iloc[:, i] for i in posicoes_valor], ignore_index=True)
+    else:
+        celulas = pd.Series([], dtype=object)
+
+    # 4.5 CLASSIFICAÇÃO VETORIZADA (ver motor de classificação acima)
+    # Uma única passagem: cada valor distinto da matriz é classificado uma vez só
+    custo, status = classificar_vetorizado(celulas)
+    validas = np.flatnonzero(status.notna().to_numpy())
+    colunas, linhas = np.divmod(validas, max(total_linhas, 1))
+
+    df_limpo = df[COLUNAS_ID].iloc[linhas].reset_index(drop=True)
+
+    # Padroniza nomes dos treinamentos (ex: "NR - 10" vira "NR 10"), uma vez por coluna
+    nomes = pd.Series(df.columns[posicoes_valor], dtype=object).str.replace('NR - ', 'NR ').str.strip()
+    df_limpo['Treinamento'] = nomes.to_numpy()[colunas]
+
+    # Guarda o valor original da célula como texto (apenas referência/auditoria;
+    # a coluna mistura números e textos, o que o formato Parquet não aceita)
+    df_limpo['Valor_Bruto'] = celulas.iloc[validas].astype(str).to_numpy()
+    df_limpo['Custo_Final'] = custo.to_numpy()[validas]
+    df_limpo['Status'] = status.to_numpy()[validas]
+
+    # Índice = posição que a célula teria no melt (coluna a coluna, linha a linha)
+    df_limpo.index = validas
+
+    # (A Busca Global usa o IndiceBusca, montado a partir destas colunas)
+    return tipar_colunas(df_limpo)
+
+
+def tipar_colunas(df):
+    """
+    Converte as dimensões da lista longa para Categorical. Também usada após
+    concatenar pedaços (atualização incremental, leitura em blocos), cujos
+    dicionários podem diferir. As categorias ficam sempre em ordem alfabética:
+    a ordenação da tabela (ordenar_posicoes) usa os códigos.
+    """
+    for col in COLUNAS_CATEGORICAS:
+        if col not in df.columns:
+            continue
+        if col == 'Status':
+            df[col] = df[col].astype(TIPO_STATUS)
+            continue
+        # astype('category') mantém a ordem de uma coluna que já é Categorical
+        # (ex: dicionários do Arrow juntados na ordem dos blocos)
+        serie = df[col].astype('category')
+        try:
+            if not serie.cat.categories.is_monotonic_increasing:
+                serie = serie.cat.reorder_categories(serie.cat.categories.sort_values())
+        except TypeError:
+            pass  # Tipos misturados (ex: número e texto): sem ordem, como no astype
+        df[col] = serie
+    return df
+
+
+
+
+# ------------------------------------------------------------------------------
+# ATUALIZAÇÃO INCREMENTAL (DIFERENÇAS ENTRE DUAS VERSÕES DA PLANILHA)
+# ------------------------------------------------------------------------------
+# Compara a planilha nova com a anterior linha a linha, pela chave (CONTRATANTE,
+# OBRAS, COORDENADOR, GERENCIA EXECUTIVA), e reprocessa apenas as obras
+# incluídas, alteradas ou removidas.
+
+def assinar_linhas(df):
+    """
+    Gera duas assinaturas (hash de 64 bits) por linha da planilha larga:
+    'chave' (só as colunas de identificação) e 'linha' (todas as colunas).
+    """
+    return pd.DataFrame({
+        'chave': pd.util.hash_pandas_object(df[COLUNAS_ID], index=False).to_numpy(),
+        'linha': pd.util.hash_pandas_object(df, index=False).to_numpy(),
+    })
+
+
+def atualizar_incremental(df_longo, df_novo, assinaturas_antigas):
+    """
+    Aplica na lista longa apenas as diferenças entre a planilha anterior e a nova.
+    - Linhas idênticas (mesmo hash de linha) são mantidas como estão.
+    - Para cada chave com alguma linha incluída/alterada/removida, as linhas
+      antigas dessa chave saem da lista e as da planilha nova são reclassificadas.
+    Retorna (nova lista longa, novas assinaturas).
+    """
+    assinaturas = assinar_linhas(df_novo)
+
+    # Compara as linhas como multiconjunto (linhas repetidas contam cada uma)
+    contagem_antiga = assinaturas_antigas['linha'].value_counts()
+    contagem_nova = assinaturas['linha'].value_counts()
+    diferenca = contagem_nova.sub(contagem_antiga, fill_value=0)
+    linhas_alteradas = diferenca[diferenca != 0].index
+
+    chaves_alteradas = pd.concat([
+        assinaturas_antigas.loc[assinaturas_antigas['linha'].isin(linhas_alteradas), 'chave'],
+        assinaturas.loc[assinaturas['linha'].isin(linhas_alteradas), 'chave'],
+    ]).unique()
+    if len(chaves_alteradas) == 0:
+        return df_longo, assinaturas
+
+    # Remove da lista longa tudo que pertence às chaves alteradas...
+    chave_longo = pd.util.hash_pandas_object(df_longo[COLUNAS_ID], index=False).to_numpy()
+    mantidos = df_longo[~np.isin(chave_longo, chaves_alteradas)]
+
+    # ...e reclassifica somente as linhas da planilha nova dessas chaves
+    reprocessar = df_novo[np.isin(assinaturas['chave'].to_numpy(), chaves_alteradas)]
+    novos = transformar_planilha(reprocessar)
+
+    return tipar_colunas(pd.concat([mantidos, novos], ignore_index=True)), assinaturas
+
+
+# ------------------------------------------------------------------------------
+# LEITURA EM BLOCOS (PLANILHAS GRANDES)
+# ------------------------------------------------------------------------------
+# pd.read_excel monta o workbook inteiro em memória e o melt multiplica as linhas
+# pelos treinamentos. Acima de LIMITE_LEITURA_COMPLETA a planilha é lida em blocos
+# de LINHAS_POR_BLOCO (openpyxl read-only / read_csv com chunksize); cada bloco
+# passa por limpeza, unpivot e classificação e só as células válidas são
+# acumuladas, em formato colunar (Arrow). O pico de memória acompanha o bloco,
+# não a planilha.
+
+LINHAS_POR_BLOCO = 5000
+LIMITE_LEITURA_COMPLETA = int(os.environ.get('QSSMA_LIMITE_MB', '50')) * 1024 * 1024
+
+# Textos que o pd.read_excel/read_csv trata como vazio por padrão; aplicados também
+# na leitura em blocos para que as colunas tenham os mesmos tipos nos dois caminhos
+TEXTOS_NULOS = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+                '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+
+def usar_leitura_em_blocos(caminho):
+    """Planilhas maiores que o limite são lidas em blocos."""
+    return os.path.getsize(caminho) > LIMITE_LEITURA_COMPLETA
+
+
+def validar_colunas(df, caminho):
+    """4.3 VALIDAÇÃO DE ESTRUTURA: levanta ValueError se faltar coluna obrigatória."""
+    faltando = [col for col in COLUNAS_ID if col not in df.columns]
+    if faltando:
+        raise ValueError(f"{os.path.basename(caminho)}: coluna obrigatória '{faltando[0]}' não encontrada.")
+
+
+def _nomes_colunas(cabecalho):
+    """Cabeçalho da planilha com os mesmos nomes que o pandas daria (Unnamed: n, repetidas .1, .2...)."""
+    nomes, vistos = [], {}
+    for i, nome in enumerate(cabecalho):
+        nome = f'Unnamed: {i}' if nome is None else nome
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f'{nome}.{vistos[nome]}'
+        else:
+            vistos[nome] = 0
+        nomes.append(nome)
+    return nomes
+
+
+def _montar_bloco(linhas, colunas):
+    """Linhas cruas do openpyxl -> DataFrame com os mesmos vazios e tipos do pd.read_excel."""
+    bloco = pd.DataFrame(linhas, columns=colunas)
+    return bloco.mask(bloco.isin(TEXTOS_NULOS)).infer_objects()
+
+
+def ler_em_blocos(caminho, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Gera a planilha larga em pedaços de até linhas_por_bloco linhas (Excel ou CSV)."""
+    if caminho.lower().endswith('.csv'):
+        yield from pd.read_csv(caminho, header=0, chunksize=linhas_por_bloco)
+        return
+
+    livro = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        linhas = livro.worksheets[0].iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        colunas = _nomes_colunas(cabecalho)
+
+        bloco = []
+        for linha in linhas:
+            if all(v is None for v in linha):
+                continue  # Linhas em branco (formatação perdida no fim da planilha)
+            bloco.append(linha[:len(colunas)])
+            if len(bloco) == linhas_por_bloco:
+                yield _montar_bloco(bloco, colunas)
+                bloco = []
+        if bloco:
+            yield _montar_bloco(bloco, colunas)
+    finally:
+        livro.close()
+
+
+def transformar_em_blocos(blocos, caminho):
+    """Limpeza + validação + unpivot/classificação bloco a bloco (gerador de listas longas)."""
+    for bloco in blocos:
+        bloco = preparar_planilha(bloco)
+        validar_colunas(bloco, caminho)
+        yield transformar_planilha(bloco)
+
+
+def acumular_colunar(blocos_longos):
+    """
+    Junta os pedaços da lista longa numa tabela Arrow e devolve um único DataFrame.
+    Cada pedaço é convertido para o mesmo esquema: dimensões como dicionários de
+    texto com índice int32 (o pandas escolhe int8/int16 conforme o bloco) e
+    colunas vazias no bloco (tipo null) como texto.
+    """
+    tabelas = []
+    for parte in blocos_longos:
+        if parte.empty:
+            continue
+        tabela = pa.Table.from_pandas(parte, preserve_index=False)
+        esquema = pa.schema([
+            campo.with_type(pa.dictionary(pa.int32(), pa.string())) if pa.types.is_dictionary(campo.type)
+            else campo.with_type(pa.string()) if pa.types.is_null(campo.type)
+            else campo
+            for campo in tabela.schema
+        ])
+        tabelas.append(tabela.cast(esquema))
+    if not tabelas:
+        return None
+    return tipar_colunas(pa.concat_tables(tabelas).to_pandas())
+
+
+def processar_em_blocos(caminho, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """ETL completo de uma planilha grande sem carregá-la inteira (ValueError se inválida)."""
+    df = acumular_colunar(transformar_em_blocos(ler_em_blocos(caminho, linhas_por_bloco), caminho))
+    if df is None:
+        raise ValueError(f"{os.path.basename(caminho)}: planilha vazia.")
+    return df
+
+
+# ------------------------------------------------------------------------------
+# INGESTÃO DE VÁRIAS PLANILHAS (UMA POR GERÊNCIA)
+# ------------------------------------------------------------------------------
+# Cada gerência mantém a própria planilha. Quando a pasta PADRAO_PLANILHAS
+# (ou um glob, ex: 'dados/*.xlsx') tem arquivos, cada um é lido e classificado
+# num processo separado e as listas longas são concatenadas, com o nome do
+# arquivo de origem em cada linha. Arquivos sem alteração saem do cache Parquet
+# (que já é por arquivo) sem ocupar nenhum processo.
+
+PADRAO_PLANILHAS = os.environ.get('QSSMA_PLANILHAS', 'planilhas')
+EXTENSOES_PLANILHA = ('.xlsx', '.xlsm', '.csv')
+
+
+def pasta_das_planilhas(padrao=PADRAO_PLANILHAS):
+    """
+    Pasta observada para o padrão: ele mesmo se for pasta, o diretório se for um
+    glob explícito (ex: 'dados/*.xlsx'). None se não houver pasta de planilhas
+    (ex: 'planilhas' padrão inexistente): só o arquivo principal é observado.
+    """
+    if os.path.isdir(padrao):
+        return padrao
+    if glob.has_magic(padrao):
+        return os.path.dirname(padrao) or '.'
+    return None
+
+
+def planilha_temporaria(caminho):
+    """Temporário que o Excel cria enquanto a planilha está aberta (~$...)."""
+    return os.path.basename(caminho).startswith('~$')
+
+
+def listar_planilhas(padrao=PADRAO_PLANILHAS):
+    """
+    Arquivos de dados que correspondem ao padrão, em ordem alfabética.
+    Ignora os temporários que o Excel cria enquanto a planilha está aberta (~$...).
+    """
+    if os.path.isdir(padrao):
+        padrao = os.path.join(padrao, '*')
+    return sorted(
+        caminho for caminho in glob.glob(padrao)
+        if caminho.lower().endswith(EXTENSOES_PLANILHA)
+        and not planilha_temporaria(caminho)
+        and os.path.isfile(caminho)
+    )
+
+
+def ler_arquivo(caminho):
+    """Lê uma planilha Excel ou CSV (pela extensão) como matriz larga."""
+    if caminho.lower().endswith('.csv'):
+        return pd.read_csv(caminho, header=0)
+    return pd.read_excel(caminho, header=0, engine='openpyxl')
+
+
+def processar_planilha(caminho):
+    """
+    ETL completo de um arquivo (roda dentro de um processo auxiliar):
+    leitura, limpeza, validação, unpivot + classificação e gravação do cache.
+    Levanta ValueError se faltar alguma coluna obrigatória.
+    """
+    digital = impressao_digital(caminho)
+    if usar_leitura_em_blocos(caminho):
+        df_longo = processar_em_blocos(caminho)
+    else:
+        df = preparar_planilha(ler_arquivo(caminho))
+        validar_colunas(df, caminho)
+        df_longo = transformar_planilha(df)
+
+    df_longo[COLUNA_ORIGEM] = os.path.basename(caminho)
+    df_longo = tipar_colunas(df_longo)
+
+    gravar_cache_etl(caminho, df_longo, digital)
+    return df_longo
+
+
+def ingerir_planilhas(arquivos, max_processos=None):
+    """
+    Consolida várias planilhas numa única lista longa.
+    Os arquivos sem cache válido são processados em paralelo (um processo por
+    arquivo, até o número de núcleos). Retorna (lista longa ou None, {arquivo: erro});
+    um arquivo com erro é deixado de fora sem derrubar os demais.
+    """
+    partes, erros, pendentes = {}, {}, []
+    for caminho in arquivos:
+        df_cache = ler_cache_etl(caminho)
+        contar_cache('etl_parquet', df_cache is not None)
+        if df_cache is not None:
+            partes[caminho] = df_cache
+        else:
+            pendentes.append(caminho)
+
+    processos = min(len(pendentes), max_processos or os.cpu_count() or 1)
+    if processos <= 1:
+        # Um arquivo só (ou um núcleo só): abrir processos custaria mais do que ganharia
+        for caminho in pendentes:
+            try:
+                partes[caminho] = processar_planilha(caminho)
+            except Exception as erro:
+                erros[caminho] = str(erro)
+    elif pendentes:
+        # 'spawn' em vez de 'fork': o processo do Streamlit tem threads (servidor,
+        # observador da pasta) que não podem ser copiadas pela metade
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as pool:
+            futuros = {pool.submit(processar_planilha, caminho): caminho for caminho in pendentes}
+            for futuro in as_completed(futuros):
+                caminho = futuros[futuro]
+                try:
+                    partes[caminho] = futuro.result()
+                except Exception as erro:
+                    erros[caminho] = str(erro)
+
+    if not partes:
+        return None, erros
+
+    # Concatena na ordem dos arquivos (resultado estável entre execuções);
+    # tipar_colunas unifica os dicionários das categorias de cada arquivo
+    df = pd.concat([partes[caminho] for caminho in arquivos if caminho in partes], ignore_index=True)
+    return tipar_colunas(df), erros
+
+
+# ------------------------------------------------------------------------------
+# CARGA COMPLETA (PONTO DE ENTRADA DO ETL)
+# ------------------------------------------------------------------------------
+class ErroETL(Exception):
+    """Falha que impede montar a lista longa; a mensagem já vem pronta para o usuário."""
+
+
+def carregar_lista_longa(avisos=None, padrao=PADRAO_PLANILHAS):
+    """
+    Escolhe a fonte (pasta de várias planilhas, cache Parquet, leitura em blocos
+    ou leitura completa) e devolve (lista longa, planilha larga preparada).
+    A planilha vem None quando o resultado saiu do cache Parquet, veio de várias
+    planilhas ou da leitura em blocos. Mensagens não fatais (planilhas ignoradas)
+    são acrescentadas em 'avisos'; falhas fatais levantam ErroETL.
+    """
+    avisos = [] if avisos is None else avisos
+
+    # 4.0 VÁRIAS PLANILHAS: se a pasta de planilhas tiver arquivos, ela substitui o arquivo único
+    arquivos = listar_planilhas(padrao)
+    if arquivos:
+        with medir('etl.ingestao', arquivos=len(arquivos)):
+            df_limpo, erros = ingerir_planilhas(arquivos)
+        avisos.extend(f"⚠️ Planilha ignorada: {erro}" for erro in erros.values())
+        if df_limpo is None:
+            raise ErroETL("❌ ERRO CRÍTICO: Nenhuma planilha válida encontrada na pasta de planilhas.")
+        return df_limpo, None
+
+    # 4.0 CACHE COLUNAR: planilha sem alterações desde o último ETL -> lê o Parquet
+    fonte = fonte_principal()
+    with medir('etl.cache'):
+        df_cache = ler_cache_etl(fonte)
+    contar_cache('etl_parquet', df_cache is not None)
+    if df_cache is not None:
+        return df_cache, None
+
+    # 4.1 PLANILHA GRANDE: leitura em blocos, sem montar a planilha inteira em memória
+    # (sem planilha larga guardada, as atualizações dela refazem o ETL em blocos)
+    if os.path.exists(fonte) and usar_leitura_em_blocos(fonte):
+        digital = impressao_digital(fonte)
+        try:
+            with medir('etl.leitura_em_blocos'):
+                df_limpo = processar_em_blocos(fonte)
+        except ValueError as erro:
+            raise ErroETL(f"❌ {erro}") from erro
+        gravar_cache_etl(fonte, df_limpo, digital)
+        return df_limpo, None
+
+    # 4.1 TENTATIVA DE LEITURA
+    with medir('etl.leitura'):
+        df, fonte, digital = ler_planilha()
+    if df is None:
+        raise ErroETL("❌ ERRO CRÍTICO: Nenhum arquivo de dados encontrado na pasta.")
+
+    # 4.2 LIMPEZA DE COLUNAS DE TOTAL
+    df = preparar_planilha(df)
+
+    # 4.3 VALIDAÇÃO DE ESTRUTURA
+    # Garante que as colunas chaves existem antes de prosseguir
+    for col in COLUNAS_ID:
+        if col not in df.columns:
+            raise ErroETL(f"Coluna obrigatória '{col}' não encontrada no arquivo.")
+
+    # 4.4 / 4.5 UNPIVOT + CLASSIFICAÇÃO
+    with medir('etl.transformar', linhas=len(df)):
+        df_limpo = transformar_planilha(df)
+
+    # Grava o resultado para os próximos carregamentos (reinícios, deploys...)
+    gravar_cache_etl(fonte, df_limpo, digital)
+
+    return df_limpo, df
+
+
+# ------------------------------------------------------------------------------
+# ÚLTIMA VERSÃO VÁLIDA (SERVIR ENQUANTO O ETL RODA)
+# ------------------------------------------------------------------------------
+# O cache Parquet de cada fonte é o resultado do último ETL que deu certo. Mesmo
+# quando a planilha já mudou, ele pode ser servido enquanto a releitura roda em
+# segundo plano (e continua servido se a releitura falhar).
+
+def data_das_planilhas(padrao=PADRAO_PLANILHAS):
+    """Data de modificação mais recente das fontes de dados atuais (None se não houver)."""
+    arquivos = listar_planilhas(padrao) or [f for f in [fonte_principal()] if os.path.exists(f)]
+    if not arquivos:
+        return None
+    return datetime.fromtimestamp(max(os.stat(f).st_mtime for f in arquivos))
+
+
+def ler_ultima_versao(padrao=PADRAO_PLANILHAS):
+    """
+    Lista longa do último ETL gravado no cache Parquet, sem exigir que a fonte
+    continue igual. Retorna (df, data dos dados, em_dia) ou (None, None, False):
+    a data é a modificação (mais recente) das planilhas que geraram o cache e
+    em_dia diz se o cache ainda corresponde a todas as fontes atuais.
+    """
+    arquivos = listar_planilhas(padrao) or [fonte_principal()]
+    partes, datas, em_dia = [], [], True
+    for fonte in arquivos:
+        destino = _caminho_cache_etl(fonte)
+        try:
+            digital = _digital_do_cache(destino)
+            if digital.get('versao_etl') != VERSAO_ETL:
+                raise ValueError("cache de outra versão do ETL")
+            partes.append(pd.read_parquet(destino))
+            datas.append(digital['mtime_ns'])
+            em_dia = em_dia and os.path.exists(fonte) and _cache_em_dia(fonte, digital)
+        except Exception:
+            em_dia = False  # Fonte sem cache utilizável: precisa do ETL
+    if not partes:
+        return None, None, False
+    df = partes[0] if len(partes) == 1 else tipar_colunas(pd.concat(partes, ignore_index=True))
+    return df, datetime.fromtimestamp(max(datas) / 1e9), em_dia
@@ -0,0 +1,78 @@
+"""
+================================================================================
+EXPORTAÇÃO EM BLOCOS (CSV / XLSX) - DASHBOARD QSSMA (PRUMO ENGENHARIA)
+================================================================================
+Gera o arquivo de download da seleção (Detalhamento) e da Auditoria sem montar
+a tabela inteira em memória: as linhas saem da lista longa em blocos de
+TAMANHO_BLOCO posições e cada bloco é escrito num arquivo temporário em disco
+(CSV bloco a bloco; XLSX pelo openpyxl em modo write-only). Só o arquivo final
+é lido de volta, uma vez, para o download. Não depende do Streamlit.
+================================================================================
+"""
+
+import tempfile                 # Arquivo intermediário em disco
+import numpy as np              # Posições das linhas
+from openpyxl import Workbook   # XLSX em modo write-only (linha a linha)
+
+TAMANHO_BLOCO = 20_000
+LINHAS_POR_ABA = 1_048_575  # Limite do Excel (1.048.576 linhas, menos o cabeçalho)
+
+# Formato -> (extensão, tipo MIME)
+FORMATOS = {
+    'CSV': ('csv', 'text/csv'),
+    'XLSX': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def blocos_da_selecao(df, posicoes, colunas, tamanho=TAMANHO_BLOCO):
+    """Trechos da lista longa nas posições informadas (na ordem delas), 'tamanho' linhas por vez."""
+    posicoes = np.asarray(posicoes)
+    for inicio in range(0, len(posicoes), tamanho):
+        yield df[colunas].iloc[posicoes[inicio:inicio + tamanho]]
+
+
+def partes_csv(blocos, colunas):
+    """
+    Bytes do CSV, bloco a bloco, no padrão do Excel brasileiro: separador ';',
+    vírgula decimal e UTF-8 com BOM (acentos corretos ao abrir com duplo clique).
+    """
+    yield ('\ufeff' + ';'.join(colunas) + '\n').encode('utf-8')
+    for bloco in blocos:
+        yield bloco.to_csv(sep=';', decimal=',', index=False, header=False).encode('utf-8')
+
+
+def escrever_xlsx(blocos, colunas, destino):
+    """Grava os blocos num XLSX write-only (nova aba a cada LINHAS_POR_ABA linhas)."""
+    livro = Workbook(write_only=True)
+    folha, linhas_na_aba = None, LINHAS_POR_ABA
+    for bloco in blocos:
+        # Vazios como célula vazia (NaN não é um valor válido no XLSX)
+        valores = bloco.astype(object).where(bloco.notna(), None)
+        for linha in valores.itertuples(index=False, name=None):
+            if linhas_na_aba == LINHAS_POR_ABA:
+                folha = livro.create_sheet(f"Dados {len(livro.worksheets) + 1}" if folha else "Dados")
+                folha.append(list(colunas))
+                linhas_na_aba = 0
+            folha.append(linha)
+            linhas_na_aba += 1
+    if folha is None:
+        livro.create_sheet("Dados").append(list(colunas))
+    livro.save(destino)
+
+
+def exportar(blocos, colunas, formato):
+    """
+    Conteúdo do arquivo ('CSV' ou 'XLSX') com os blocos informados. Os blocos
+    são escritos em disco um a um; a memória fica no tamanho de um bloco mais o
+    arquivo final devolvido.
+    """
+    with tempfile.TemporaryFile() as arquivo:
+        if formato == 'CSV':
+            for parte in partes_csv(blocos, colunas):
+                arquivo.write(parte)
+        elif formato == 'XLSX':
+            escrever_xlsx(blocos, colunas, arquivo)
+        else:
+            raise ValueError(f"Formato de exportação desconhecido: {formato!r} (use {' ou '.join(FORMATOS)})")
+        arquivo.seek(0)
+        return arquivo.read()
@@ -0,0 +1,173 @@
+"""
+================================================================================
+MOTOR DE FILTROS - DASHBOARD QSSMA (PRUMO ENGENHARIA)
+================================================================================
+Máscaras por código das dimensões Categorical (cascata da barra lateral) e
+memo do resultado de cada seleção, compartilhado entre as sessões.
+================================================================================
+"""
+
+import numpy as np              # Máscaras booleanas e leituras indexadas
+import pandas as pd             # Tamanho estimado dos resultados guardados no memo
+import pyarrow as pa            # Idem (seleções do motor Arrow, qssma/consultas.py)
+import os                       # Orçamento e validade do memo via variáveis de ambiente
+import threading                # O memo é compartilhado pelas sessões (threads)
+from dataclasses import fields, is_dataclass
+from cachetools import TTLCache
+
+from qssma.etl import COLUNAS_ID
+from qssma.busca import tokenizar
+from qssma.diagnostico import contar_cache
+
+
+# ------------------------------------------------------------------------------
+# MOTOR DE FILTROS (MÁSCARAS POR CÓDIGO)
+# ------------------------------------------------------------------------------
+# Cada dimensão já é Categorical: o código inteiro da linha funciona como índice
+# de bitmap. Selecionar valores vira uma tabela booleana por categoria e a
+# máscara da dimensão sai de uma única leitura indexada (tabela[códigos]),
+# equivalente ao OU dos bitmaps dos valores escolhidos, sem guardar um vetor por
+# valor. As dimensões são combinadas com E numa única máscara de linhas.
+
+COLUNAS_FILTRO = COLUNAS_ID + ['Treinamento']
+
+
+class MotorFiltros:
+    """
+    Códigos de cada dimensão filtrável, deslocados em +1 e guardados no menor
+    inteiro sem sinal possível (0 = célula vazia), e os dicionários de nomes.
+    """
+
+    def __init__(self, df):
+        self.total_linhas = len(df)
+        self.codigos = {}
+        self.nomes = {}
+        self.posicao = {}
+        self.usados = {}       # Categorias com pelo menos uma linha na base
+        self.preenchidas = {}  # Só para dimensões com células vazias: linhas com valor
+        for col in COLUNAS_FILTRO:
+            serie = df[col].astype('category')
+            nomes = [str(c) for c in serie.cat.categories]
+            tipo = np.min_scalar_type(len(nomes) + 1)
+            self.codigos[col] = (serie.cat.codes.to_numpy() + 1).astype(tipo)
+            self.nomes[col] = np.array(nomes, dtype=object)
+            self.posicao[col] = {nome: k + 1 for k, nome in enumerate(nomes)}
+            self.usados[col] = np.bincount(self.codigos[col], minlength=len(nomes) + 1)[1:] > 0
+            if serie.hasnans:
+                self.preenchidas[col] = self.codigos[col] != 0
+
+    def mascara_inicial(self, linhas=None):
+        """Máscara com todas as linhas (ou apenas as posições informadas, ex: resultado da busca)."""
+        if linhas is None:
+            return np.ones(self.total_linhas, dtype=bool)
+        mascara = np.zeros(self.total_linhas, dtype=bool)
+        mascara[linhas] = True
+        return mascara
+
+    def opcoes(self, col, mascara):
+        """Valores da dimensão presentes nas linhas marcadas, em ordem alfabética."""
+        if mascara.all():
+            # Visão inicial (nada filtrado): todos os valores da base
+            return sorted(self.nomes[col][self.usados[col]])
+        presentes = np.zeros(len(self.nomes[col]) + 1, dtype=bool)
+        presentes[self.codigos[col][mascara]] = True
+        return sorted(self.nomes[col][presentes[1:]])
+
+    def aplicar(self, mascara, col, selecionados, opcoes=None):
+        """
+        E lógico (no próprio vetor) entre a máscara e 'linha pertence a um dos
+        valores selecionados'. Linhas sem valor na dimensão nunca passam, como no isin.
+        Se 'opcoes' for informada e todas estiverem selecionadas, a dimensão não
+        restringe nada além das células vazias e a leitura dos códigos é evitada.
+        """
+        if opcoes is not None and len(selecionados) == len(opcoes):
+            if col in self.preenchidas:
+                mascara &= self.preenchidas[col]
+            return mascara
+
+        tabela = np.zeros(len(self.nomes[col]) + 1, dtype=bool)
+        tabela[[self.posicao[col][v] for v in selecionados if v in self.posicao[col]]] = True
+        mascara &= np.take(tabela, self.codigos[col])
+        return mascara
+
+
+# ------------------------------------------------------------------------------
+# MEMO DE SELEÇÕES (COMPARTILHADO ENTRE SESSÕES)
+# ------------------------------------------------------------------------------
+# Quase todo mundo abre o dashboard na mesma visão (tudo marcado, nenhum
+# treinamento). O resultado de cada seleção (células, linhas e KPIs) fica num
+# cache único do processo, com chave canônica: versão dos dados + palavras da
+# busca + seleção de cada dimensão ('*' = todas as opções). Vale por
+# TTL_MEMO_SEG, sai primeiro o menos usado e o total respeita ORCAMENTO_MEMO_MB.
+
+ORCAMENTO_MEMO_MB = float(os.environ.get('QSSMA_MEMO_MB', 256))
+TTL_MEMO_SEG = float(os.environ.get('QSSMA_MEMO_TTL', 900))
+
+
+def chave_selecao(versao, termo, selecoes):
+    """
+    Chave canônica do estado dos filtros. 'selecoes' = [(coluna, selecionados,
+    opções ou None)]; com todas as opções marcadas a dimensão vira '*', e a busca
+    vira o conjunto ordenado de palavras (mesma regra do IndiceBusca).
+    """
+    busca = tuple(sorted(set(tokenizar(termo)))) if termo else ()
+    dimensoes = tuple(
+        (col, '*' if opcoes is not None and len(selecionados) == len(opcoes) else tuple(sorted(selecionados)))
+        for col, selecionados, opcoes in selecoes
+    )
+    return versao, busca, dimensoes
+
+
+def tamanho_estimado(valor):
+    """
+    Bytes ocupados por DataFrames/arrays/tabelas Arrow (também dentro de tuplas e dataclasses).
+    Sem 'deep': os textos das fatias são os mesmos objetos da base, não cópias.
+    """
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return int(np.sum(valor.memory_usage(index=True)))
+    if isinstance(valor, (np.ndarray, pa.Table)):
+        return valor.nbytes
+    if isinstance(valor, (tuple, list)):
+        return sum(tamanho_estimado(v) for v in valor)
+    if is_dataclass(valor):
+        return sum(tamanho_estimado(getattr(valor, f.name)) for f in fields(valor))
+    return 64
+
+
+class MemoSelecoes:
+    """
+    Cache LRU com validade (TTL) e orçamento de memória, seguro entre threads.
+    Sessões que pedem a mesma chave ao mesmo tempo esperam um único cálculo.
+    Os resultados são compartilhados: quem os recebe não deve alterá-los.
+    """
+
+    def __init__(self, orcamento_mb=ORCAMENTO_MEMO_MB, ttl_seg=TTL_MEMO_SEG):
+        self._itens = TTLCache(maxsize=orcamento_mb * 1024 ** 2, ttl=ttl_seg, getsizeof=tamanho_estimado)
+        self._trava = threading.Lock()
+        self._calculando = {}  # chave -> trava do cálculo em andamento
+
+    def obter(self, chave, calcular):
+        """Resultado da chave; calcula com calcular() se não estiver guardado."""
+        with self._trava:
+            if chave in self._itens:
+                contar_cache('selecoes', True)
+                return self._itens[chave]
+            trava_chave = self._calculando.setdefault(chave, threading.Lock())
+
+        with trava_chave:
+            with self._trava:
+                if chave in self._itens:  # Outra sessão terminou o cálculo enquanto esperávamos
+                    contar_cache('selecoes', True)
+                    return self._itens[chave]
+            contar_cache('selecoes', False)
+            try:
+                resultado = calcular()
+                with self._trava:
+                    try:
+                        self._itens[chave] = resultado
+                    except ValueError:
+                        pass  # Maior que o orçamento inteiro: devolve sem guardar
+            finally:
+                with self._trava:
+                    self._calculando.pop(chave, None)
+        return resultado
@@ -0,0 +1,68 @@
+"""
+================================================================================
+FORMATAÇÃO DE VALORES - DASHBOARD QSSMA (PRUMO ENGENHARIA)
+================================================================================
+Moeda brasileira (R$ 1.234,56), célula a célula e em lote (NumPy).
+================================================================================
+"""
+
+import pandas as pd             # pd.isna na versão escalar
+import numpy as np              # Formatação vetorizada (tabelas de texto)
+
+
+def formatar_brl(valor):
+    """
+    Formata valores float para moeda brasileira (R$ 1.234,56).
+    Trata erros caso venha valor nulo ou zero.
+    """
+    if pd.isna(valor) or valor == 0:
+        return "R$ 0,00"
+    # Lógica: Formata com vírgula padrão US (1,234.56) e depois inverte os caracteres
+    return f"R$ {valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+# Tabelas de texto para a formatação vetorizada: "0".."999", "000".."999", "00".."99"
+_GRUPO_INICIAL = np.array([str(i) for i in range(1000)])
+_GRUPO_MILHAR = np.array([f"{i:03d}" for i in range(1000)])
+_CENTAVOS = np.array([f"{i:02d}" for i in range(100)])
+
+
+def formatar_brl_vetorizado(valores):
+    """
+    Mesmo resultado do formatar_brl para um vetor inteiro de uma vez: a conta é
+    feita em centavos inteiros e os textos saem de tabelas prontas (NumPy), sem
+    chamar Python linha a linha. Deve ser usada apenas no trecho que vai para a
+    tela (ex: página da tabela exibida, Top 50).
+    """
+    valores = np.asarray(valores, dtype=float)
+    resultado = np.full(valores.shape, "R$ 0,00", dtype=object)
+    if valores.size == 0:
+        return resultado
+
+    absolutos = np.abs(valores)
+    escalados = absolutos * 100
+    centavos = np.rint(escalados)
+
+    # Casos que a conta em float pode arredondar diferente do f-string (valores
+    # colados em meio centavo, enormes ou infinitos) usam a versão escalar
+    duvidosos = (np.abs(escalados - np.floor(escalados) - 0.5) <= 4 * np.spacing(escalados)) | ~(absolutos < 1e15)
+    validos = ~(np.isnan(valores) | (valores == 0)) & ~duvidosos
+
+    centavos = centavos[validos].astype(np.int64)
+    inteiro, resto = np.divmod(centavos, 100)
+
+    # Milhares: grupos de 3 dígitos com zeros à esquerda, unidos por "." ...
+    grupos = max(1, len(str(int(inteiro.max(initial=0)))) // 3 + 1)
+    agrupado = _GRUPO_MILHAR[inteiro % 1000]
+    for k in range(1, grupos):
+        agrupado = np.strings.add(np.strings.add(_GRUPO_MILHAR[(inteiro // 1000 ** k) % 1000], "."), agrupado)
+    # ... e depois remove os zeros/pontos à esquerda ("000.001.234" -> "1.234")
+    agrupado = np.strings.lstrip(agrupado, "0.")
+    agrupado = np.where(inteiro < 1000, _GRUPO_INICIAL[inteiro % 1000], agrupado)
+
+    sinal = np.where(valores[validos] < 0, "R$ -", "R$ ")
+    resultado[validos] = np.strings.add(np.strings.add(sinal, agrupado), np.strings.add(",", _CENTAVOS[resto]))
+
+    for i in np.flatnonzero(duvidosos & ~np.isnan(valores)):
+        resultado.flat[i] = formatar_brl(valores.flat[i])
+    return resultado
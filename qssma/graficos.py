@@ -0,0 +1,143 @@
+"""
+================================================================================
+GRÁFICOS - DASHBOARD QSSMA (PRUMO ENGENHARIA)
+================================================================================
+Montagem das figuras Plotly a partir das células do cubo (seções 7.2 e 7.3 do
+app). Cada função devolve a figura pronta, ou None quando não há dados.
+CacheFiguras guarda as figuras já montadas (LRU), compartilhadas entre sessões.
+Importa o Plotly: só deve ser carregado no caminho da interface (ou benchmarks).
+================================================================================
+"""
+
+import hashlib                  # Assinatura da seleção (chave do cache)
+import os                       # Tamanho do cache via variável de ambiente
+import threading                # O cache é compartilhado pelas sessões (threads)
+
+import numpy as np              # Máscara de células compactada em bits
+import plotly.express as px     # Criação de gráficos interativos
+from cachetools import LRUCache
+
+from qssma.kpis import VALOR_SAVING_UNITARIO
+from qssma.diagnostico import contar_cache
+
+
+# Rótulo de moeda dos gráficos: formatado pelo próprio Plotly no navegador.
+# (usar com layout separators=',.' -> decimal ',' e milhar '.', padrão BR)
+TEMPLATE_BRL = 'R$ %{x:,.2f}'
+SEPARADORES_BRL = ',.'
+
+
+def figura_top10_custos(cubo_ext, cor):
+    """GRÁFICO 1: Top 10 custos externos por treinamento (barras horizontais)."""
+    if cubo_ext.empty:
+        return None
+    df_chart = cubo_ext.groupby('Treinamento', observed=True)['Custo_Final'].sum().reset_index().sort_values('Custo_Final', ascending=True).tail(10)
+
+    # Rótulo "R$ 1.234,56" montado na renderização (sem coluna de texto)
+    fig = px.bar(df_chart, x='Custo_Final', y='Treinamento', orientation='h')
+    fig.update_traces(marker_color=cor, textfont_color='white', texttemplate=TEMPLATE_BRL)
+    fig.update_layout(xaxis_title=None, yaxis_title=None, plot_bgcolor='rgba(0,0,0,0)', uniformtext_minsize=8, uniformtext_mode='hide', separators=SEPARADORES_BRL)
+    return fig
+
+
+def figura_status(cubo, cores):
+    """GRÁFICO 2: Pizza (rosca) de quantidade por Status."""
+    df_pie = cubo.groupby('Status', observed=True)['Qtd'].sum().sort_values(ascending=False).reset_index()
+    return px.pie(df_pie, values='Qtd', names='Status', hole=0.6, color='Status', color_discrete_map=cores)
+
+
+def figura_ranking_custo(cubo_ext, agrupar, cor):
+    """RANKING 1: Quem mais investe (soma do custo externo), 10 maiores."""
+    df_rank_ext = cubo_ext.groupby(agrupar, observed=True)['Custo_Final'].sum().reset_index()
+    df_rank_ext = df_rank_ext.sort_values('Custo_Final', ascending=True).tail(10)
+    if df_rank_ext.empty:
+        return None
+
+    fig = px.bar(df_rank_ext, x='Custo_Final', y=agrupar, orientation='h')
+    fig.update_traces(marker_color=cor, textfont_color='white', texttemplate=TEMPLATE_BRL)
+    fig.update_layout(xaxis_title=None, yaxis_title=None, plot_bgcolor='rgba(0,0,0,0)', margin=dict(l=0,r=0,t=0,b=0), separators=SEPARADORES_BRL)
+    return fig
+
+
+def figura_ranking_saving(cubo_int, agrupar, cor):
+    """RANKING 2: Quem mais gera Saving (quantidade interna x valor de mercado), 10 maiores."""
+    df_rank_int = cubo_int.groupby(agrupar, observed=True)['Qtd'].sum().reset_index()
+    df_rank_int['Valor_Saving'] = df_rank_int['Qtd'] * VALOR_SAVING_UNITARIO
+    df_rank_int = df_rank_int.sort_values('Valor_Saving', ascending=True).tail(10)
+    if df_rank_int.empty:
+        return None
+
+    fig = px.bar(df_rank_int, x='Valor_Saving', y=agrupar, orientation='h')
+    fig.update_traces(marker_color=cor, textfont_color='white', texttemplate=TEMPLATE_BRL)
+    fig.update_layout(xaxis_title=None, yaxis_title=None, plot_bgcolor='rgba(0,0,0,0)', margin=dict(l=0,r=0,t=0,b=0), separators=SEPARADORES_BRL)
+    return fig
+
+
+def figura_eficiencia(cubo, agrupar, cores):
+    """RANKING 3: Volume Interno vs Externo empilhado, 10 maiores volumes totais."""
+    # Prepara dados empilhados
+    df_prop = cubo.groupby([agrupar, 'Status'], observed=True)['Qtd'].sum().reset_index()
+    # Filtra os 10 maiores volumes totais
+    top_vol = df_prop.groupby(agrupar, observed=True)['Qtd'].sum().sort_values(ascending=False).head(10).index
+    df_prop = df_prop[df_prop[agrupar].isin(top_vol)]
+
+    fig = px.bar(df_prop, x='Qtd', y=agrupar, color='Status', orientation='h',
+                 color_discrete_map=cores, text='Qtd')
+    fig.update_layout(xaxis_title="Qtd", yaxis_title=None, plot_bgcolor='rgba(0,0,0,0)',
+                      legend=dict(orientation="h", y=-0.2), margin=dict(l=0,r=0,t=0,b=0))
+    return fig
+
+
+def figura_tendencia(evolucao, cores):
+    """EVOLUÇÃO: Investimento e Saving por data de snapshot (qssma/historico.py); None com menos de 2 datas."""
+    if len(evolucao) < 2:
+        return None
+    df_linhas = evolucao.melt(id_vars='Data', value_vars=['Investimento', 'Saving'], var_name='Indicador', value_name='Valor')
+
+    fig = px.line(df_linhas, x='Data', y='Valor', color='Indicador', markers=True, color_discrete_map=cores)
+    fig.update_traces(hovertemplate='%{x|%d/%m/%Y}<br>R$ %{y:,.2f}')
+    fig.update_layout(xaxis_title=None, yaxis_title=None, yaxis_tickprefix='R$ ', plot_bgcolor='rgba(0,0,0,0)',
+                      legend=dict(orientation="h", y=-0.2), margin=dict(l=0,r=0,t=0,b=0), separators=SEPARADORES_BRL)
+    return fig
+
+
+# ------------------------------------------------------------------------------
+# CACHE DE FIGURAS (LRU)
+# ------------------------------------------------------------------------------
+# As figuras dependem só das células selecionadas do cubo (e do agrupamento nos
+# rankings). A seleção é identificada pela versão dos dados + hash da máscara de
+# células, que resume a busca e todos os filtros: trocar de aba, mexer na tabela
+# ou repetir uma seleção já vista (em qualquer sessão) não remonta nenhuma figura.
+
+MAXIMO_FIGURAS = int(os.environ.get('QSSMA_CACHE_FIGURAS', 256))
+
+
+def assinatura_selecao(versao, mascara):
+    """Chave curta da seleção: (versão dos dados, hash da máscara booleana de células)."""
+    bits = np.packbits(np.asarray(mascara, dtype=bool))
+    return versao, len(mascara), hashlib.blake2b(bits.tobytes(), digest_size=16).hexdigest()
+
+
+class CacheFiguras:
+    """
+    LRU de figuras prontas, limitado a 'maximo' itens e seguro entre threads.
+    Figuras guardadas são compartilhadas: quem as recebe não deve alterá-las.
+    """
+
+    def __init__(self, maximo=MAXIMO_FIGURAS):
+        self._figuras = LRUCache(maxsize=maximo)
+        self._trava = threading.Lock()
+
+    def obter(self, chave, montar):
+        """Figura da chave; monta com montar() (fora da trava) na primeira vez."""
+        with self._trava:
+            encontrada = chave in self._figuras
+            figura = self._figuras.get(chave)
+        contar_cache('figuras', encontrada)
+        if encontrada:
+            return figura
+
+        figura = montar()
+        with self._trava:
+            self._figuras[chave] = figura
+        return figura
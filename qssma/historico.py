@@ -0,0 +1,208 @@
+"""
+================================================================================
+HISTÓRICO DE SNAPSHOTS - DASHBOARD QSSMA (PRUMO ENGENHARIA)
+================================================================================
+Cada ETL acrescenta um snapshot datado da lista longa classificada a um
+repositório Parquet particionado por data (só acrescenta, nunca reescreve):
+
+    .historico/data=2026-10-17/parte-<ns>.parquet
+    .historico/_estado.parquet       # último estado (chave + assinatura), para o diff
+
+Linhas sem alteração desde o snapshot anterior não são gravadas de novo: cada
+partição guarda só as linhas novas/alteradas e as removidas (removida=True).
+A evolução de investimento e saving é reconstruída somando as diferenças de
+cada linha, lendo apenas as partições até a data pedida e as colunas usadas:
+as planilhas antigas nunca são relidas. Não depende do Streamlit.
+================================================================================
+"""
+
+import os                       # Pasta do histórico via variável de ambiente
+import glob                     # Localização das partes gravadas
+import threading                # App (monitor) e linha de comando gravam em threads
+import time                     # Instante da gravação (ordem dentro do mesmo dia)
+from datetime import date
+
+import numpy as np              # Diferenças por linha (vetorizado)
+import pandas as pd             # Hash das linhas e série da evolução
+import pyarrow as pa            # Tabelas das partes
+import pyarrow.dataset as ds    # Leitura com poda de partições e colunas
+import pyarrow.parquet as pq    # Gravação das partes e do estado
+
+from qssma.etl import COLUNAS_ID, COLUNA_ORIGEM
+from qssma.kpis import VALOR_SAVING_UNITARIO
+from qssma.diagnostico import medir
+
+# Pasta do repositório de snapshots (vazio desliga o histórico)
+PASTA_HISTORICO = os.environ.get('QSSMA_HISTORICO', '.historico')
+ARQUIVO_ESTADO = '_estado.parquet'  # Prefixo '_': ignorado na leitura das partições
+
+# Identidade de uma linha entre snapshots e o conteúdo que define se ela mudou
+COLUNAS_CHAVE = COLUNAS_ID + ['Treinamento']
+COLUNAS_CONTEUDO = ['Valor_Bruto', 'Status', 'Custo_Final']
+PARTICOES = ds.partitioning(pa.schema([('data', pa.date32())]), flavor='hive')
+
+_trava_gravacao = threading.Lock()
+
+
+# ------------------------------------------------------------------------------
+# GRAVAÇÃO (SNAPSHOT COM DEDUPLICAÇÃO)
+# ------------------------------------------------------------------------------
+
+def _partes(pasta):
+    """Partes gravadas, em ordem de gravação (data da partição, depois instante)."""
+    return sorted(glob.glob(os.path.join(pasta, 'data=*', 'parte-*.parquet')))
+
+
+def versao_historico(pasta=PASTA_HISTORICO):
+    """Identificador da última gravação (muda a cada snapshot); None se vazio."""
+    partes = _partes(pasta) if pasta else []
+    return os.path.relpath(partes[-1], pasta) if partes else None
+
+
+def _data_da_parte(parte):
+    """Data da partição (pasta data=AAAA-MM-DD) de uma parte."""
+    return date.fromisoformat(os.path.basename(os.path.dirname(parte))[len('data='):])
+
+
+def datas_snapshot(pasta=PASTA_HISTORICO):
+    """Datas com pelo menos uma parte gravada, em ordem."""
+    return sorted({_data_da_parte(p) for p in _partes(pasta)}) if pasta else []
+
+
+def _dataset(pasta, partes):
+    """
+    Dataset só com as partes informadas (não a pasta inteira): temporários de
+    uma gravação em andamento ou interrompida nunca entram na leitura.
+    """
+    return ds.dataset(partes, format='parquet', partitioning=PARTICOES, partition_base_dir=pasta)
+
+
+def assinar_snapshot(df):
+    """
+    Colunas gravadas + 'chave' (identidade da linha: dimensões, treinamento e a
+    ocorrência, para linhas repetidas) e 'assinatura' (hash do conteúdo).
+    """
+    chaves = COLUNAS_CHAVE + ([COLUNA_ORIGEM] if COLUNA_ORIGEM in df.columns else [])
+    base = df[chaves + COLUNAS_CONTEUDO].reset_index(drop=True)
+    base = base.astype({col: 'string' for col in chaves + ['Valor_Bruto', 'Status']})
+    ocorrencia = base.groupby(chaves, dropna=False, sort=False).cumcount()
+    base['chave'] = pd.util.hash_pandas_object(base[chaves].assign(ocorrencia=ocorrencia), index=False).to_numpy()
+    base['assinatura'] = pd.util.hash_pandas_object(base[COLUNAS_CONTEUDO], index=False).to_numpy()
+    return base
+
+
+def _ler_estado(pasta, partes):
+    """
+    Último estado conhecido (linhas vivas: chave, assinatura e dimensões).
+    Se o arquivo de estado não corresponder à última parte (ex: gravação
+    interrompida), ele é reconstruído a partir das partes.
+    """
+    caminho = os.path.join(pasta, ARQUIVO_ESTADO)
+    ultima = os.path.relpath(partes[-1], pasta) if partes else None
+    if os.path.exists(caminho):
+        estado = pq.read_table(caminho)
+        if (estado.schema.metadata or {}).get(b'ultima_parte', b'').decode() == (ultima or ''):
+            return estado.to_pandas()
+    if not partes:
+        return None
+    linhas = _dataset(pasta, partes).to_table().to_pandas()
+    linhas = linhas.sort_values(['data', 'gravacao'], kind='stable').drop_duplicates('chave', keep='last')
+    return linhas[~linhas['removida']].drop(columns=['data', 'gravacao', 'removida'] + COLUNAS_CONTEUDO)
+
+
+def _gravar_atomico(tabela, destino, metadados=None):
+    """
+    Grava a tabela num temporário e renomeia (leitores nunca veem arquivo pela
+    metade). O temporário começa com '.', prefixo que os leitores ignoram.
+    """
+    if metadados:
+        tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}), **metadados})
+    temporario = os.path.join(os.path.dirname(destino), '.' + os.path.basename(destino) + '.tmp')
+    pq.write_table(tabela, temporario)
+    os.replace(temporario, destino)
+
+
+def registrar_snapshot(df, pasta=PASTA_HISTORICO, data=None):
+    """
+    Acrescenta o snapshot 'data' (padrão: hoje) da lista longa ao histórico,
+    gravando só as linhas novas, alteradas ou removidas desde o anterior.
+    Retorna quantas linhas foram gravadas (0 = nada mudou, nenhuma parte criada).
+    Snapshots devem ser gravados em ordem: data anterior ao último levanta ValueError.
+    """
+    if not pasta:
+        return 0
+    data = data or date.today()
+    with _trava_gravacao, medir('historico.snapshot', linhas=len(df)):
+        partes = _partes(pasta)
+        datas = datas_snapshot(pasta)
+        if datas and data < datas[-1]:
+            raise ValueError(f"Snapshot de {data} é anterior ao último gravado ({datas[-1]}).")
+
+        atual = assinar_snapshot(df)
+        anterior = _ler_estado(pasta, partes)
+        if anterior is None:
+            mudou = atual.assign(removida=False)
+        else:
+            assinaturas = pd.Series(anterior['assinatura'].to_numpy(), index=anterior['chave'].to_numpy())
+            novas = atual[atual['assinatura'].to_numpy() != assinaturas.reindex(atual['chave'].to_numpy()).to_numpy()]
+            saiu = anterior[~anterior['chave'].isin(atual['chave'])]
+            mudou = pd.concat([novas.assign(removida=False), saiu.assign(removida=True)], ignore_index=True)
+        if mudou.empty:
+            return 0
+
+        gravacao = time.time_ns()
+        destino = os.path.join(pasta, f"data={data.isoformat()}", f"parte-{gravacao}.parquet")
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        _gravar_atomico(pa.Table.from_pandas(mudou.assign(gravacao=gravacao), preserve_index=False), destino)
+
+        estado = atual.drop(columns=COLUNAS_CONTEUDO)
+        _gravar_atomico(pa.Table.from_pandas(estado, preserve_index=False), os.path.join(pasta, ARQUIVO_ESTADO),
+                        {b'ultima_parte': os.path.relpath(destino, pasta).encode()})
+        return len(mudou)
+
+
+# ------------------------------------------------------------------------------
+# EVOLUÇÃO NO TEMPO (INVESTIMENTO E SAVING)
+# ------------------------------------------------------------------------------
+# Cada linha gravada carrega o valor novo; a diferença para a gravação anterior
+# da mesma chave é a contribuição daquela data. Somando as diferenças por data
+# e acumulando, sai o total de cada snapshot sem remontar os estados inteiros.
+# Filtros por dimensão são empurrados para a leitura (predicado do dataset).
+
+def tendencia(pasta=PASTA_HISTORICO, fim=None, filtros=None):
+    """
+    DataFrame por data de snapshot com Investimento (custo externo), Qtd_Interno
+    e Saving. 'filtros' = {dimensão: valores}; 'fim' limita as partições lidas.
+    """
+    colunas = ['Data', 'Investimento', 'Qtd_Interno', 'Saving']
+    partes = [p for p in _partes(pasta) if fim is None or _data_da_parte(p) <= fim] if pasta else []
+    datas = sorted({_data_da_parte(p) for p in partes})
+    if not datas:
+        return pd.DataFrame(columns=colunas)
+
+    with medir('historico.tendencia', snapshots=len(datas)):
+        condicao = None
+        for col, valores in (filtros or {}).items():
+            dentro = ds.field(col).isin(list(valores))
+            condicao = dentro if condicao is None else condicao & dentro
+        linhas = _dataset(pasta, partes).to_table(
+            columns=['data', 'gravacao', 'chave', 'Status', 'Custo_Final', 'removida'], filter=condicao,
+        ).to_pandas()
+        linhas = linhas.sort_values(['chave', 'data', 'gravacao'], kind='stable')
+
+        viva = ~linhas['removida'].to_numpy()
+        externo = linhas['Status'].eq('Externo (Custo)').fillna(False).to_numpy(dtype=bool)
+        interno = linhas['Status'].eq('Interno (SESMT)').fillna(False).to_numpy(dtype=bool)
+        custo = np.where(viva & externo, linhas['Custo_Final'].fillna(0).to_numpy(), 0.0)
+        interno = (viva & interno).astype(np.int64)
+        mesma = linhas['chave'].eq(linhas['chave'].shift()).to_numpy()
+        diferencas = pd.DataFrame({
+            'Data': linhas['data'].to_numpy(),
+            'Investimento': custo - np.where(mesma, np.roll(custo, 1), 0.0),
+            'Qtd_Interno': interno - np.where(mesma, np.roll(interno, 1), 0),
+        })
+
+        evolucao = (diferencas.groupby('Data').sum()
+                    .reindex(pd.Index(datas, name='Data'), fill_value=0).cumsum().reset_index())
+        evolucao['Saving'] = evolucao['Qtd_Interno'] * VALOR_SAVING_UNITARIO
+        return evolucao[colunas]
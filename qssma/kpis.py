@@ -0,0 +1,100 @@
+"""
+================================================================================
+MOTOR DE KPIS - DASHBOARD QSSMA (PRUMO ENGENHARIA)
+================================================================================
+Cubo de agregação da lista longa e indicadores do topo do dashboard.
+Não depende do Streamlit (usado pelo app e pela linha de comando).
+================================================================================
+"""
+
+import pandas as pd             # Agrupamentos do cubo e dos KPIs
+import numpy as np              # Posições das linhas por célula
+from dataclasses import dataclass
+
+
+# ------------------------------------------------------------------------------
+# MOTOR DE KPIS
+# ------------------------------------------------------------------------------
+# Valor de mercado de um treinamento externo, usado para estimar o Saving.
+# (Para alterar o valor do saving, mude o número 200.00 abaixo)
+VALOR_SAVING_UNITARIO = 200.00
+
+
+@dataclass(frozen=True)
+class Indicadores:
+    """Métricas do topo do dashboard + partições por Status para os gráficos."""
+    inv_total: float
+    qtd_interno: int
+    saving: float
+    qtd_total: int
+    nome_inv: str
+    val_inv: float
+    externo: pd.DataFrame   # Partição 'Externo (Custo)'
+    interno: pd.DataFrame   # Partição 'Interno (SESMT)'
+
+
+def particionar_por_status(df):
+    """
+    Separa o DataFrame por Status num único agrupamento.
+    Retorna {status: DataFrame}, com os dois status sempre presentes.
+    """
+    grupos = df.groupby('Status', observed=True).indices
+    vazio = np.array([], dtype=np.int64)
+    return {
+        status: df.iloc[grupos.get(status, vazio)]
+        for status in ('Externo (Custo)', 'Interno (SESMT)')
+    }
+
+
+def calcular_kpis(cubo):
+    """
+    Calcula todos os indicadores da seção 6 a partir das células do cubo
+    (colunas Status, Qtd, Custo_Final e dimensões). Uma única passagem agrupada
+    gera os totais por Status e as partições; novos KPIs devem partir delas.
+    """
+    partes = particionar_por_status(cubo)
+    externo, interno = partes['Externo (Custo)'], partes['Interno (SESMT)']
+
+    # KPI Maior Investidor: Agrupa por coordenador e vê quem tem maior custo
+    top_inv = externo.groupby('COORDENADOR', observed=True)['Custo_Final'].sum().sort_values(ascending=False)
+    qtd_interno = int(interno['Qtd'].sum())
+
+    return Indicadores(
+        inv_total=externo['Custo_Final'].sum(),        # Soma tudo que é classificado como 'Externo'
+        qtd_interno=qtd_interno,                       # Quantidade realizada pelo SESMT
+        saving=qtd_interno * VALOR_SAVING_UNITARIO,    # Quantidade Interna * Valor de Mercado
+        qtd_total=int(externo['Qtd'].sum()) + qtd_interno,  # Registros válidos
+        nome_inv=str(top_inv.index[0]) if not top_inv.empty else "N/A",
+        val_inv=top_inv.iloc[0] if not top_inv.empty else 0,
+        externo=externo,
+        interno=interno,
+    )
+
+
+# ------------------------------------------------------------------------------
+# CUBO DE AGREGAÇÃO
+# ------------------------------------------------------------------------------
+# Pré-agrega a lista longa por todas as dimensões + Status (quantidade e soma de
+# custo). KPIs, gráficos e rankings somam células do cubo em vez de linhas; busca
+# e filtros também atuam sobre as células. As linhas brutas só são buscadas
+# (via 'celula', o número da célula de cada linha) para as tabelas de detalhe.
+
+DIMENSOES_CUBO = ['CONTRATANTE', 'GERENCIA EXECUTIVA', 'COORDENADOR', 'OBRAS', 'Treinamento', 'Status']
+
+
+def montar_cubo(df):
+    """
+    Retorna (cubo, celula): o cubo tem uma linha por combinação observada, com
+    'Qtd' (registros) e 'Custo_Final' (soma); 'celula' diz a qual linha do cubo
+    cada linha da lista longa pertence (-1 se alguma dimensão estiver vazia,
+    pois essas linhas nunca passam pelos filtros).
+    """
+    grupos = df.groupby(DIMENSOES_CUBO, observed=True)
+    cubo = grupos.agg(Qtd=('Custo_Final', 'size'), Custo_Final=('Custo_Final', 'sum')).reset_index()
+    celula = grupos.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    return cubo, celula
+
+
+def linhas_das_celulas(mascara_cubo, celula):
+    """Posições (iloc) das linhas da lista longa que pertencem às células marcadas."""
+    return np.flatnonzero(np.append(mascara_cubo, False)[celula])
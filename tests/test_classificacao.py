@@ -0,0 +1,75 @@
+"""
+Paridade do classificar_vetorizado (usado pelo ETL) com o classificar_seguro
+(regras de negócio de referência, célula a célula).
+"""
+
+import os
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qssma.etl import ARQUIVO_EXCEL, COLUNAS_ID, classificar_seguro, classificar_vetorizado, preparar_planilha
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASOS = [
+    # Vazios e exclusões
+    None, np.nan, '', '   ', '-', ' - ', 'nan', 'None', 'N/A', 'n/a', 'NA', 'N.A', 'SEM REALIZAÇÃO', 'Sem realização',
+    # Saving (interno)
+    'INTERNO', 'interno', 'Interno SESMT', 'PRUMO', 'prumo', 'Realizado pela Prumo', 'N/A INTERNO',
+    # Números
+    0, 1, 250, -10, 0.0, 1.5, -0.5, 1200.75, True, False, np.int64(7), np.float64(3.25),
+    # Textos numéricos
+    'R$ 1.200,00', 'R$1.200,00', '1.200', '1,5', '400', ' 400 ', '0', '-5', '0,00', 'R$ 0,00',
+    'inf', '-inf', '1e3', '1.200.300,45',
+    # Datas e lixo
+    datetime(2024, 3, 1), date(2024, 3, 1), pd.Timestamp('2024-03-01'), 'OK', 'realizado', 'R$', ',', 'abc123',
+]
+
+
+def referencia(valores):
+    """(custo, status) célula a célula, com vazio como NaN/None para comparar."""
+    resultados = [classificar_seguro(v) for v in valores]
+    custo = np.array([np.nan if c is None else c for c, _ in resultados], dtype=float)
+    return custo, [s for _, s in resultados]
+
+
+def conferir(valores):
+    """Compara as duas versões; listas viram coluna object, Series mantêm o tipo lido."""
+    serie = valores if isinstance(valores, pd.Series) else pd.Series(valores, dtype=object)
+    custo, status = classificar_vetorizado(serie)
+    custo_ref, status_ref = referencia(serie.tolist())
+    np.testing.assert_array_equal(custo.to_numpy(dtype=float), custo_ref)
+    assert [None if pd.isna(s) else s for s in status] == status_ref
+
+
+@pytest.mark.parametrize('valor', CASOS, ids=repr)
+def test_caso_isolado(valor):
+    conferir([valor])
+
+
+def test_casos_juntos():
+    # Vários valores distintos na mesma coluna (fatoração) e repetidos
+    conferir(CASOS + CASOS[::-1])
+
+
+@pytest.mark.parametrize('valores', [
+    [0, 1, -3, 250],
+    [0.0, 1.5, np.nan, -2.0, 1200.75],
+    [True, False, True],
+], ids=['int', 'float', 'bool'])
+def test_colunas_numericas(valores):
+    # Atalho das colunas 100% numéricas (sem operações de texto)
+    conferir(pd.Series(valores))
+
+
+def test_planilha_versionada():
+    caminho = os.path.join(RAIZ, ARQUIVO_EXCEL)
+    if not os.path.exists(caminho):
+        pytest.skip(f"{ARQUIVO_EXCEL} não encontrado")
+    planilha = preparar_planilha(pd.read_excel(caminho, header=0, engine='openpyxl'))
+    for coluna in planilha.columns.difference(COLUNAS_ID):
+        conferir(planilha[coluna])                           # Tipo lido do Excel
+        conferir(pd.Series(planilha[coluna].tolist(), dtype=object))
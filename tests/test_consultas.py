@@ -0,0 +1,75 @@
+"""
+Paridade do motor Arrow com o pandas (qssma/consultas.py), incluindo planilhas
+com dimensões não textuais (ex: OBRAS numéricas, como o Excel/CSV entregam).
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qssma.etl import transformar_planilha
+from qssma.kpis import montar_cubo
+from qssma.consultas import criar_consultas
+from qssma.filtros import COLUNAS_FILTRO
+
+
+def planilha(obras):
+    """Matriz larga pequena com as obras informadas (podem ser números)."""
+    return pd.DataFrame({
+        'CONTRATANTE': ['ALFA', 'ALFA', 'BETA', 'BETA', None],
+        'OBRAS': obras,
+        'COORDENADOR': ['ANA', 'BRUNO', 'ANA', 'CARLA', 'BRUNO'],
+        'GERENCIA EXECUTIVA': [1, 1, 2, 2, 3],
+        'NR - 10': [350, 'INTERNO', '-', 'R$ 1.200,00', 80.5],
+        'NR 35': ['N/A', 420, 'PRUMO', 90, 'INTERNO'],
+    })
+
+
+def motores(df):
+    cubo, _ = montar_cubo(df)
+    return criar_consultas(df, cubo, 'pandas'), criar_consultas(df, cubo, 'arrow')
+
+
+@pytest.mark.parametrize('obras', [
+    ['101', '102', '103', '101', '104'],
+    [101, 102, 103, 101, 104],
+    [101.0, 102.5, 103.0, 101.0, np.nan],
+], ids=['texto', 'int', 'float'])
+def test_filtros_e_selecao(obras):
+    pandas_, arrow = motores(transformar_planilha(planilha(obras)))
+
+    mascaras = [pandas_.filtros.mascara_inicial(), arrow.filtros.mascara_inicial()]
+    for col in COLUNAS_FILTRO:
+        opcoes = [pandas_.filtros.opcoes(col, mascaras[0]), arrow.filtros.opcoes(col, mascaras[1])]
+        assert opcoes[0] == opcoes[1]
+        assert all(isinstance(v, str) for v in opcoes[1])
+        # Marca só a primeira opção (ou todas, quando há uma só)
+        selecionados = opcoes[0][:1]
+        mascaras = [
+            motor.filtros.aplicar(mascara, col, selecionados, opcoes_motor)
+            for motor, mascara, opcoes_motor in zip((pandas_, arrow), mascaras, opcoes)
+        ]
+        np.testing.assert_array_equal(mascaras[0], mascaras[1])
+
+    kpis = [motor.selecao(pandas_.filtros.mascara_inicial())[1] for motor in (pandas_, arrow)]
+    for campo in ('inv_total', 'qtd_interno', 'saving', 'qtd_total', 'nome_inv', 'val_inv'):
+        assert getattr(kpis[1], campo) == pytest.approx(getattr(kpis[0], campo))
+
+
+@pytest.mark.parametrize('obras', [[101, 102, 103, 101, 104]], ids=['int'])
+def test_agregados_e_auditoria(obras):
+    df = transformar_planilha(planilha(obras))
+    pandas_, arrow = motores(df)
+    mascara = pandas_.filtros.mascara_inicial()
+    (cubo_p, kpis_p), (cubo_a, kpis_a) = pandas_.selecao(mascara), arrow.selecao(mascara)
+    pd.testing.assert_frame_equal(cubo_p.reset_index(drop=True), cubo_a.to_pandas(),
+                                  check_dtype=False, check_categorical=False)
+
+    ordem = ['OBRAS']
+    agregado = [motor.agregar(tabela, ordem, 'Custo_Final').sort_values(ordem).reset_index(drop=True)
+                for motor, tabela in ((pandas_, kpis_p.externo), (arrow, kpis_a.externo))]
+    pd.testing.assert_frame_equal(agregado[0], agregado[1], check_dtype=False, check_categorical=False)
+
+    linhas = np.arange(len(df))
+    auditoria = [motor.maiores_custos_externos(linhas, 3) for motor in (pandas_, arrow)]
+    assert auditoria[0]['Custo_Final'].tolist() == auditoria[1]['Custo_Final'].tolist()
@@ -0,0 +1,122 @@
+"""
+Histórico de snapshots (qssma/historico.py): só as diferenças são gravadas e a
+evolução reconstruída bate com os KPIs de cada estado da planilha.
+"""
+
+import os
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from qssma.etl import transformar_planilha
+from qssma.kpis import calcular_kpis, montar_cubo
+from qssma.historico import datas_snapshot, registrar_snapshot, tendencia
+
+DIA_1, DIA_2, DIA_3, DIA_4 = (date(2026, 10, d) for d in (1, 2, 3, 4))
+
+
+def planilha(linhas):
+    """Matriz larga: (contratante, obra, coordenador, NR 10, NR 35) por linha."""
+    return pd.DataFrame(linhas, columns=['CONTRATANTE', 'OBRAS', 'COORDENADOR', 'NR 10', 'NR 35']).assign(
+        **{'GERENCIA EXECUTIVA': 'GE 1'})
+
+
+BASE = [
+    ('ALFA', 'OBRA 1', 'ANA', 350, 'INTERNO'),
+    ('ALFA', 'OBRA 2', 'BRUNO', 'R$ 1.200,00', '-'),
+    ('BETA', 'OBRA 3', 'CARLA', 'PRUMO', 90),
+    ('BETA', 'OBRA 3', 'CARLA', 'PRUMO', 90),  # Linha repetida: cada ocorrência é uma chave
+]
+ESTADOS = {
+    DIA_1: BASE,
+    # Custo alterado, interno virou externo, obra removida e obra nova
+    DIA_2: [
+        ('ALFA', 'OBRA 1', 'ANA', 500, 'INTERNO'),
+        ('ALFA', 'OBRA 2', 'BRUNO', 'R$ 1.200,00', 'INTERNO'),
+        ('BETA', 'OBRA 3', 'CARLA', 'PRUMO', 90),
+        ('GAMA', 'OBRA 4', 'ANA', 'N/A', 'PRUMO'),
+    ],
+    # Volta a linha repetida e some uma das células
+    DIA_4: [
+        ('ALFA', 'OBRA 1', 'ANA', 500, '-'),
+        ('ALFA', 'OBRA 2', 'BRUNO', 'R$ 1.200,00', 'INTERNO'),
+        ('BETA', 'OBRA 3', 'CARLA', 'PRUMO', 90),
+        ('BETA', 'OBRA 3', 'CARLA', 'PRUMO', 90),
+        ('GAMA', 'OBRA 4', 'ANA', 'N/A', 'PRUMO'),
+    ],
+}
+
+
+def lista_longa(linhas):
+    return transformar_planilha(planilha(linhas))
+
+
+def conferir_kpis(evolucao, filtros=None):
+    """Cada ponto da evolução = calcular_kpis do estado daquela data (com os mesmos filtros)."""
+    assert list(evolucao['Data']) == list(ESTADOS)
+    for (_, ponto), linhas in zip(evolucao.iterrows(), ESTADOS.values()):
+        df = lista_longa(linhas)
+        for col, valores in (filtros or {}).items():
+            df = df[df[col].isin(valores)]
+        kpis = calcular_kpis(montar_cubo(df)[0])
+        assert ponto['Investimento'] == pytest.approx(kpis.inv_total)
+        assert ponto['Qtd_Interno'] == kpis.qtd_interno
+        assert ponto['Saving'] == pytest.approx(kpis.saving)
+
+
+@pytest.fixture
+def historico(tmp_path):
+    pasta = str(tmp_path / 'historico')
+    gravadas = {data: registrar_snapshot(lista_longa(linhas), pasta, data) for data, linhas in ESTADOS.items()}
+    return pasta, gravadas
+
+
+def test_tendencia_igual_aos_kpis_de_cada_estado(historico):
+    pasta, _ = historico
+    conferir_kpis(tendencia(pasta))
+
+
+@pytest.mark.parametrize('filtros', [{'CONTRATANTE': ['ALFA']}, {'COORDENADOR': ['ANA', 'CARLA']}])
+def test_tendencia_com_filtros(historico, filtros):
+    pasta, _ = historico
+    conferir_kpis(tendencia(pasta, filtros=filtros), filtros)
+
+
+def test_grava_so_as_diferencas(historico):
+    pasta, gravadas = historico
+    assert gravadas[DIA_1] == len(lista_longa(BASE))
+    # Dia 2: 3 células novas/alteradas + as 2 da ocorrência removida; as outras 4 não mudaram
+    assert gravadas[DIA_2] == 5
+
+    # Mesmo estado de novo: nada gravado, nenhuma partição nova
+    partes = sorted(os.listdir(pasta))
+    assert registrar_snapshot(lista_longa(ESTADOS[DIA_4]), pasta, DIA_4) == 0
+    assert registrar_snapshot(lista_longa(ESTADOS[DIA_4]), pasta, date(2026, 10, 5)) == 0
+    assert sorted(os.listdir(pasta)) == partes
+    assert datas_snapshot(pasta) == list(ESTADOS)
+
+
+def test_fim_limita_as_particoes(historico):
+    pasta, _ = historico
+    evolucao = tendencia(pasta, fim=DIA_3)
+    assert list(evolucao['Data']) == [DIA_1, DIA_2]
+
+
+def test_snapshot_fora_de_ordem(historico):
+    pasta, _ = historico
+    with pytest.raises(ValueError):
+        registrar_snapshot(lista_longa(BASE), pasta, DIA_3)
+
+
+def test_temporario_perdido_e_ignorado(historico):
+    pasta, _ = historico
+    # Gravação interrompida: temporário no formato antigo e no atual, estado apagado
+    particao = os.path.join(pasta, f"data={DIA_4.isoformat()}")
+    for nome in ('parte-1.parquet.tmp', '.parte-2.parquet.tmp'):
+        with open(os.path.join(particao, nome), 'wb') as arquivo:
+            arquivo.write(b'meio arquivo')
+    os.remove(os.path.join(pasta, '_estado.parquet'))
+
+    conferir_kpis(tendencia(pasta))
+    assert registrar_snapshot(lista_longa(ESTADOS[DIA_4]), pasta, DIA_4) == 0  # Estado reconstruído das partes
@@ -0,0 +1,62 @@
+"""
+Leitura em blocos (processar_em_blocos) x leitura completa (read_excel/read_csv +
+transformar_planilha): mesmas linhas, tipos e categorias em ordem alfabética.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qssma.etl import (
+    ARQUIVO_EXCEL, COLUNAS_CATEGORICAS, preparar_planilha, processar_em_blocos, transformar_planilha,
+)
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CAMINHO_EXCEL = os.path.join(RAIZ, ARQUIVO_EXCEL)
+
+# Valor_Bruto fica de fora: o tipo é inferido por bloco ("1600" x "1600.0")
+COLUNAS = ['CONTRATANTE', 'OBRAS', 'COORDENADOR', 'GERENCIA EXECUTIVA', 'Treinamento', 'Custo_Final', 'Status']
+
+
+def em_ordem(df):
+    """Linhas em ordem canônica (os blocos saem em outra ordem que a leitura completa)."""
+    return df[COLUNAS].sort_values(COLUNAS, key=lambda s: s.astype(str)).reset_index(drop=True)
+
+
+@pytest.fixture(scope='module')
+def planilha():
+    if not os.path.exists(CAMINHO_EXCEL):
+        pytest.skip(f"{ARQUIVO_EXCEL} não encontrado")
+    return pd.read_excel(CAMINHO_EXCEL, header=0, engine='openpyxl')
+
+
+@pytest.mark.parametrize('formato', ['xlsx', 'csv'])
+def test_blocos_iguais_a_leitura_completa(planilha, formato, tmp_path):
+    if formato == 'xlsx':
+        caminho, completa = CAMINHO_EXCEL, planilha
+    else:
+        caminho = str(tmp_path / 'planilha.csv')
+        planilha.to_csv(caminho, index=False)
+        completa = pd.read_csv(caminho, header=0)
+
+    esperado = transformar_planilha(preparar_planilha(completa))
+    obtido = processar_em_blocos(caminho, linhas_por_bloco=20)
+
+    pd.testing.assert_frame_equal(em_ordem(obtido), em_ordem(esperado), check_categorical=False)
+    for col in COLUNAS_CATEGORICAS:
+        if col in obtido.columns:
+            assert list(obtido[col].cat.categories) == list(esperado[col].cat.categories), col
+
+
+def test_categorias_em_ordem_alfabetica(planilha):
+    df = processar_em_blocos(CAMINHO_EXCEL, linhas_por_bloco=20)
+    for col in ['CONTRATANTE', 'OBRAS', 'COORDENADOR', 'Treinamento']:
+        categorias = list(df[col].cat.categories)
+        assert categorias == sorted(categorias), col
+        # Ordenar pelos códigos (como a tabela do Detalhamento) = ordenar pelos nomes
+        codigos = df[col].cat.codes.to_numpy()
+        nomes = df[col].astype(str).to_numpy()
+        ordem = np.argsort(codigos, kind='stable')
+        assert list(nomes[ordem]) == sorted(nomes), col